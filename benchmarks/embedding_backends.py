@@ -0,0 +1,169 @@
+### benchmarks/embedding_backends.py
+"""
+Parity and latency check for the embedding backends (embedding.backend in config.yaml).
+
+Every backend encodes the same texts in a fresh interpreter, so its peak RSS
+(model, runtime and imports) isn't mixed up with another backend's. Vectors are
+compared against the PyTorch reference (cosine per text, and overlap of each
+text's top-k neighbours) along with load time and single-query latency. Exits
+non-zero when a backend's minimum cosine falls below --min-cosine.
+
+Texts come from the live index's metadata when one exists, else a built-in sample.
+
+Usage: python benchmarks/embedding_backends.py [--backends torch int8 onnx] [--queries 200] [--threads 0]
+"""
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import index_files
+from embedder import BACKENDS, MODEL_NAME, THREADS, load_model
+from metadata_store import MetadataStore
+
+SAMPLE_TEXTS = [
+    "how do I reset my password",
+    "the app crashes when I upload a video",
+    "where can I download last month's invoice",
+    "error E-1042 when connecting to the server",
+    "how to add a new user to my team",
+    "can I change the language of the interface",
+    "payment failed but money was charged",
+    "how do I export my data to csv",
+]
+
+
+def corpus_texts(limit: int) -> list:
+    version = index_files.current_version()
+    if version is not None:
+        metadata_path = index_files.paths(version)["metadata"]
+        if metadata_path.exists():
+            texts = [chunk["text"] for _, chunk in MetadataStore(metadata_path).items()]
+            if texts:
+                return texts[:limit]
+    return (SAMPLE_TEXTS * (limit // len(SAMPLE_TEXTS) + 1))[:limit]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, and a process-wide high-water mark: only meaningful per process
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+def top_k_overlap(reference: np.ndarray, candidate: np.ndarray, k: int) -> float:
+    """Mean fraction of each text's k nearest neighbours (within the sample) that both backends agree on."""
+    k = min(k, len(reference) - 1)
+    if k < 1:
+        return 1.0
+    ref_sim, cand_sim = reference @ reference.T, candidate @ candidate.T
+    np.fill_diagonal(ref_sim, -np.inf)
+    np.fill_diagonal(cand_sim, -np.inf)
+    ref_top = np.argpartition(-ref_sim, k, axis=1)[:, :k]
+    cand_top = np.argpartition(-cand_sim, k, axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]))
+
+
+def measure(backend: str, texts: list, threads: int) -> tuple:
+    started = time.perf_counter()
+    model = load_model(backend, threads)
+    load_s = time.perf_counter() - started
+    model.encode(["warm up"])
+
+    latencies = []
+    for text in texts:
+        started = time.perf_counter()
+        model.encode([text])
+        latencies.append((time.perf_counter() - started) * 1000)
+    vectors = np.asarray(model.encode(texts, batch_size=64), dtype=np.float32)
+
+    latencies.sort()
+    return vectors, {
+        "load_s": round(load_s, 3),
+        "query_ms_p50": round(statistics.median(latencies), 3),
+        "query_ms_p95": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_backend(backend: str, args, vectors_path: Path) -> dict:
+    """Measure one backend in a fresh interpreter; its vectors come back through vectors_path."""
+    command = [sys.executable, __file__, "--worker", backend, "--vectors-out", str(vectors_path),
+               "--queries", str(args.queries), "--threads", str(args.threads)]
+    out = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against PyTorch")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--vectors-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    texts = corpus_texts(args.queries)
+    if args.worker is not None:
+        try:
+            vectors, row = measure(args.worker, texts, args.threads)
+        except ImportError as e:
+            print(json.dumps({"skipped": str(e)}))
+            return
+        np.save(args.vectors_out, vectors)
+        print(json.dumps(row))
+        return
+
+    # The reference goes first: every other backend is compared against its vectors
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    reference = None
+    report, failed = {}, []
+    with tempfile.TemporaryDirectory(prefix="embedding-backends-") as workdir:
+        for backend in backends:
+            vectors_path = Path(workdir) / f"{backend}.npy"
+            try:
+                row = run_backend(backend, args, vectors_path)
+            except RuntimeError as e:
+                report[backend] = {"error": str(e)}
+                failed.append(backend)
+                continue
+            if "skipped" in row:
+                report[backend] = row
+                continue
+            vectors = normalize(np.load(vectors_path))
+            if reference is None:
+                reference = vectors
+            cosine = (vectors * reference).sum(axis=1)
+            row.update({
+                "cosine_min": round(float(cosine.min()), 5),
+                "cosine_mean": round(float(cosine.mean()), 5),
+                f"top{args.top_k}_overlap": round(top_k_overlap(reference, vectors, args.top_k), 4),
+            })
+            report[backend] = row
+            if row["cosine_min"] < args.min_cosine:
+                failed.append(backend)
+
+    print(json.dumps({"model": MODEL_NAME, "texts": len(texts), "threads": args.threads, "backends": report}, indent=2, ensure_ascii=False))
+    if failed:
+        print(f"❌ Failed or below parity (min cosine < {args.min_cosine}): {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
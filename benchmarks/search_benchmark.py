@@ -0,0 +1,292 @@
+### benchmarks/search_benchmark.py
+"""
+End-to-end benchmark on a synthetic corpus: indexer.build_index, search, format_result.
+
+For every corpus size a fresh interpreter (so peak RSS is per size) generates synthetic
+sheet FAQ rows and video chunks (summary, steps, FAQ) across several services, builds
+the index into a temporary directory, then replays a query log:
+  build_s, peak_rss_mb, index_bytes       — the indexer
+  latency_ms p50/p95/p99, qps             — sequential SearchEngine.search calls
+  batched_qps                             — the whole log submitted at once through the micro-batcher
+  format_ms p50/p95                       — format_result on each query's top group
+
+Runs offline: by default embeddings are stub vectors (hashed bag-of-words, so related
+texts are still close); --model NAME uses a locally cached sentence-transformers model.
+The semantic answer cache and reranking are off so every query does the full work.
+
+Results go to benchmarks/results/search-<commit>.json (or --output) for comparison.
+
+Usage: python benchmarks/search_benchmark.py [--sizes 1k 10k 100k 1m] [--queries 1000]
+                                             [--query-log FILE] [--model all-MiniLM-L6-v2]
+                                             [--index-type flat] [--storage float32] [--metric l2]
+"""
+import argparse
+import json
+import logging
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+PRODUCTS = ["billing", "mobile-app", "dashboard", "api", "reports", "integrations", "auth", "storage"]
+ACTIONS = ["reset", "export", "import", "delete", "rename", "share", "configure", "enable", "disable",
+           "download", "upload", "sync", "restore", "invite", "cancel", "upgrade"]
+OBJECTS = ["password", "invoice", "report", "workspace", "user", "project", "api key", "webhook",
+           "subscription", "dashboard widget", "backup", "team", "payment method", "notification",
+           "calendar", "csv file", "integration", "profile photo", "two-factor auth", "audit log"]
+PLACES = ["settings page", "admin panel", "profile menu", "billing tab", "sidebar", "mobile app"]
+ERRORS = ["E-1042", "E-2001", "timeout", "403 forbidden", "quota exceeded", "sync conflict"]
+
+
+def parse_size(text: str) -> int:
+    text = text.lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+# === SYNTHETIC DATA ===
+
+def question(rng) -> str:
+    action, obj = rng.choice(ACTIONS), rng.choice(OBJECTS)
+    if rng.random() < 0.2:
+        return f"Why do I get {rng.choice(ERRORS)} when I {action} the {obj}?"
+    return f"How do I {action} the {obj} in {rng.choice(PRODUCTS)}?"
+
+
+def answer(rng) -> str:
+    steps = [f"open the {rng.choice(PLACES)}", f"{rng.choice(ACTIONS)} the {rng.choice(OBJECTS)}", "save the changes"]
+    return "You can " + ", then ".join(steps) + "."
+
+
+def sheet_chunk(rng, service: str, tab: str) -> dict:
+    return {
+        "text": f"Q: {question(rng)}\nA: {answer(rng)}",
+        "source": "sheet",
+        "service": service,
+        "origin": tab,
+        "type": "faq",
+    }
+
+
+def video_chunks(rng, service: str, video_id: str) -> list:
+    common = {"source": "video", "service": service, "origin": video_id,
+              "url": f"https://example.com/videos/{video_id}", "title": question(rng).rstrip("?")}
+    steps = [f"{rng.choice(ACTIONS).capitalize()} the {rng.choice(OBJECTS)} from the {rng.choice(PLACES)}"
+             for _ in range(rng.integers(3, 8))]
+    chunks = [
+        {**common, "type": "summary", "text": f"This video shows how to {answer(rng)[8:]}"},
+        {**common, "type": "steps", "text": "\n".join(f"- {step}" for step in steps), "steps": steps},
+    ]
+    chunks += [{**common, "type": "faq", "text": f"Q: {question(rng)}\nA: {answer(rng)}"} for _ in range(3)]
+    return chunks
+
+
+def synthetic_sources(size: int, seed: int = 0, batch: int = 1000):
+    """(video_batches, sheet_batches) generators yielding ~size chunks in total, ~30% video."""
+    def videos():
+        rng = np.random.default_rng(seed)
+        total, batch_chunks, video = int(size * 0.3), [], 0
+        while total > 0:
+            service = PRODUCTS[video % len(PRODUCTS)]
+            chunks = video_chunks(rng, service, f"video-{video}")[:total]
+            batch_chunks += chunks
+            total -= len(chunks)
+            video += 1
+            if len(batch_chunks) >= batch:
+                yield batch_chunks
+                batch_chunks = []
+        if batch_chunks:
+            yield batch_chunks
+
+    def sheets():
+        rng = np.random.default_rng(seed + 1)
+        total = size - int(size * 0.3)
+        for start in range(0, total, batch):
+            yield [
+                sheet_chunk(rng, PRODUCTS[row % len(PRODUCTS)], f"faq-tab-{row // 500}")
+                for row in range(start, min(start + batch, total))
+            ]
+
+    return videos, sheets
+
+
+def synthetic_queries(n: int, seed: int = 42) -> list:
+    rng = np.random.default_rng(seed)
+    return [question(rng).lower().rstrip("?") for _ in range(n)]
+
+
+class StubModel:
+    """Offline stand-in for SentenceTransformer: hashed bag-of-words vectors, L2-normalized."""
+
+    def __init__(self, dim: int = 384, buckets: int = 1 << 14):
+        self.table = np.random.default_rng(0).standard_normal((buckets, dim)).astype(np.float32)
+        self.buckets = buckets
+
+    def encode(self, texts, **kwargs):
+        from lexical_index import tokenize
+        vectors = np.zeros((len(texts), self.table.shape[1]), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text) or [""]
+            vectors[row] = self.table[[zlib.crc32(t.encode()) % self.buckets for t in tokens]].sum(axis=0)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+
+# === ONE SIZE, IN A FRESH INTERPRETER ===
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def percentiles(samples: list, points=(50, 95, 99)) -> dict:
+    return {f"p{p}": round(float(np.percentile(samples, p)), 3) for p in points}
+
+
+def run_size(args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="qa-bench-", dir=args.workdir))
+    try:
+        return measure(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(args, workdir: Path) -> dict:
+    sys.path.insert(0, str(ROOT))
+
+    # Seed the config cache before any repo module reads config.yaml at import time
+    import config.config_loader as config_loader
+    config_loader._config_cache = {
+        "index": {"dir": str(workdir / "index"), "type": args.index_type, "storage": args.storage,
+                  "metric": args.metric, "keep_versions": 1},
+        "embedding": {"model": args.model or "stub", "cache_dir": str(workdir / "embedding_cache")},
+        "search": {"semantic_cache": {"enabled": False}, "rerank": {"enabled": False}},
+        "data_sources": {},
+    }
+    logging.basicConfig(level=logging.WARNING)
+
+    import embedder
+    import index_files
+    import indexer
+    import search
+    if not args.model:
+        embedder._model = StubModel()
+
+    videos, sheets = synthetic_sources(args.worker)
+    indexer.iter_video_chunks, indexer.iter_sheet_chunks = videos, sheets
+    started = time.perf_counter()
+    _, known, version = indexer.build_index(incremental=False)
+    build_s = time.perf_counter() - started
+    build_rss = peak_rss_mb()
+    index_bytes = sum(p.stat().st_size for p in index_files.version_dir(version).rglob("*") if p.is_file())
+
+    if args.query_log:
+        queries = [line.strip() for line in open(args.query_log, encoding="utf-8") if line.strip()][:args.queries]
+    else:
+        queries = synthetic_queries(args.queries)
+
+    engine = search.get_engine()
+    engine.warm_up()
+    latencies, format_ms, hits = [], [], 0
+    replay_started = time.perf_counter()
+    for query in queries:
+        started = time.perf_counter()
+        groups = engine.search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if groups:
+            hits += 1
+            started = time.perf_counter()
+            search.format_result(groups[0])
+            format_ms.append((time.perf_counter() - started) * 1000)
+    replay_s = time.perf_counter() - replay_started
+
+    # The batched pass should embed its queries too, not reuse the sequential pass's vectors
+    embedder._query_cache.clear()
+    started = time.perf_counter()
+    for future in [search.submit_search(query) for query in queries]:
+        future.result()
+    batched_s = time.perf_counter() - started
+
+    return {
+        "size": args.worker,
+        "chunks_indexed": len(known),
+        "build_s": round(build_s, 3),
+        "build_peak_rss_mb": build_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "index_bytes": index_bytes,
+        "queries": len(queries),
+        "queries_with_hits": hits,
+        "latency_ms": percentiles(latencies),
+        "qps": round(len(queries) / replay_s, 1),
+        "batched_qps": round(len(queries) / batched_s, 1),
+        "format_ms": percentiles(format_ms, (50, 95)) if format_ms else None,
+    }
+
+
+# === DRIVER ===
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexing and search on a synthetic corpus")
+    parser.add_argument("--sizes", nargs="+", default=["1k", "10k"], help="corpus sizes, e.g. 1k 10k 100k 1m")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--query-log", help="file with one query per line (default: synthetic queries)")
+    parser.add_argument("--model", help="locally cached sentence-transformers model (default: stub vectors)")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--storage", default="float32")
+    parser.add_argument("--metric", default="l2")
+    parser.add_argument("--workdir", help="where to build the temporary indexes (default: system temp)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/search-<commit>.json)")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_size(args)))
+        return
+
+    commit = git_commit()
+    results = []
+    for size in args.sizes:
+        command = [sys.executable, __file__, "--worker", str(parse_size(size))]
+        for flag in ("queries", "query_log", "model", "index_type", "storage", "metric", "workdir"):
+            value = getattr(args, flag)
+            if value is not None:
+                command += [f"--{flag.replace('_', '-')}", str(value)]
+        out = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            print(out.stderr, file=sys.stderr)
+            sys.exit(f"❌ Benchmark failed at size {size}")
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "embeddings": args.model or "stub",
+        "index": {"type": args.index_type, "storage": args.storage, "metric": args.metric},
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"search-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+    print(f"📊 Results saved to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+### benchmarks/startup_benchmark.py
+"""
+Cold-start benchmark for the search stack.
+
+Each phase runs in a fresh interpreter so nothing is already imported or cached:
+  import      — `import search` (what bot.py pays before it connects to Telegram)
+  warm_up     — loading the FAISS index, metadata store and embedding model
+  first_query — the first search() after warm-up
+
+Usage: python benchmarks/startup_benchmark.py [--runs 3] [--query "how do I reset my password"]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import search
+t1 = time.perf_counter()
+engine = search.get_engine()
+engine.warm_up()
+t2 = time.perf_counter()
+search.search({query!r})
+t3 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "warm_up": t2 - t1, "first_query": t3 - t2}}))
+"""
+
+
+def run_once(query: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(root=str(ROOT), query=query)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure search cold-start time")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--query", default="how do I reset my password")
+    args = parser.parse_args()
+
+    runs = [run_once(args.query) for _ in range(args.runs)]
+    report = {phase: round(statistics.median(r[phase] for r in runs), 4) for phase in runs[0]}
+    print(json.dumps({"runs": args.runs, "median_s": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,28 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ApplicationBuilder, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 
+import asyncio
 import os
 import logging
+import signal
 import sys
 import time
 from pathlib import Path
+from types import SimpleNamespace
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from config.config_loader import load_config_yaml
 from sheets.update_feedback import increment_feedback
-from sheets.staging_qa import log_staging_qa
-from sheets.user_tracker import log_user_if_new, get_email_by_username, get_email_by_user_id
-from search import search, format_result
+from sheets.staging_qa import log_staging_qa_batch
+from sheets.batch_writer import MAX_DELAY as SHEETS_BATCH_DELAY, MAX_ROWS as SHEETS_BATCH_ROWS
+from sheets.user_tracker import log_users_if_new, get_email_by_username, get_email_by_user_id
+from search import submit_search, format_result, render_group, answer_key, get_engine
 from zammad.zammad_client import create_ticket
+from workers.executor import run_io, shutdown_executors
+from workers.outbox import Outbox
+import metrics
+from ttl_cache import TTLCache
 
 # === LOGGING SETUP ===
 logging.basicConfig(level=logging.INFO)
@@ -31,14 +39,44 @@ if not BOT_TOKEN or not BOT_USERNAME:
 
 # === LOAD CONFIG ===
 config = load_config_yaml()
-CONFIDENCE_THRESHOLD = float(config.get("confidence_threshold", 0.75))
+# Answer untagged questions only below this distance; with index.metric: cosine it can be
+# set as a similarity instead (confidence_similarity), which carries over between models
+if config.get("confidence_similarity") is not None:
+    CONFIDENCE_THRESHOLD = 1 - float(config["confidence_similarity"])
+else:
+    CONFIDENCE_THRESHOLD = float(config.get("confidence_threshold", 0.75))
 
 staging_cfg = config.get("data_sources", {}).get("google_sheets", {}).get("staging", {})
 STAGING_SHEET_URL = staging_cfg.get("url")
 STAGING_SHEET_TAB = staging_cfg.get("tab", "staging_qa")
 
+# Telegram chat id -> service: each support group only searches its own product's shard;
+# chats not listed search every service
+CHAT_SERVICES = {str(chat_id): service for chat_id, service in config.get("bot", {}).get("chat_services", {}).items()}
+
+# How many updates PTB may process at once; without this, handlers run strictly one after another
+CONCURRENT_UPDATES = int(config.get("bot", {}).get("concurrent_updates", 32))
+
+METRICS_INTERVAL = float(config.get("metrics", {}).get("log_interval", 60))
+
+# Rendered answers only change when the index is rebuilt; keys carry the index version
+ANSWER_CACHE_SIZE = int(config.get("bot", {}).get("answer_cache_size", 1024))
+ANSWER_CACHE_TTL = float(config.get("bot", {}).get("answer_cache_ttl", 24 * 3600))
+rendered_answers = TTLCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+
 # === TELEGRAM BOT ===
-app = ApplicationBuilder().token(BOT_TOKEN).build()
+app = ApplicationBuilder().token(BOT_TOKEN).concurrent_updates(CONCURRENT_UPDATES).build()
+
+def format_answer(group: dict) -> str:
+    key = answer_key(group)
+    rendered = rendered_answers.get(key)
+    if rendered is None:
+        metrics.inc("bot.answer_cache_misses")
+        rendered = render_group(group)
+        rendered_answers.set(key, rendered)
+    else:
+        metrics.inc("bot.answer_cache_hits")
+    return format_result(group, rendered)
 
 def clean_query(text: str) -> str:
     return text.replace(f"@{BOT_USERNAME}", "").strip()
@@ -65,6 +103,30 @@ def build_user_info(user) -> dict:
         "lastname": user.last_name or ""
     }
 
+def user_payload(user) -> dict:
+    """JSON-safe snapshot of the Telegram user for outbox jobs."""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name
+    }
+
+# === SIDE EFFECT OUTBOX ===
+# Handlers run on outbox worker threads and must raise on failure so the job is retried.
+def open_ticket(user: dict, subject: str, body: str):
+    create_ticket(subject=subject, body=body, user_info=build_user_info(SimpleNamespace(**user)))
+
+def track_users(payloads: list):
+    log_users_if_new([SimpleNamespace(**payload["user"]) for payload in payloads])
+
+outbox = Outbox()
+outbox.register("ticket", open_ticket)
+# Sheets jobs are claimed in batches (full, or once the oldest row is SHEETS_BATCH_DELAY old)
+# and written with one append_rows call each, to stay under the per-minute write quota
+outbox.register("staging_qa", log_staging_qa_batch, batch_size=SHEETS_BATCH_ROWS, max_delay=SHEETS_BATCH_DELAY)
+outbox.register("track_user", track_users, batch_size=SHEETS_BATCH_ROWS, max_delay=SHEETS_BATCH_DELAY)
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message or not update.message.text:
         return
@@ -78,24 +140,26 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     is_tagged = is_mentioned(update)
     start_time = time.time()
-    results = search(text)
+    # Micro-batched with other chats' queries on the search thread; the event loop only awaits
+    service = CHAT_SERVICES.get(str(update.effective_chat.id))
+    results = await asyncio.wrap_future(submit_search(text, service=service))
     elapsed = time.time() - start_time
 
     # Track user every time
-    log_user_if_new(user)
+    outbox.enqueue("track_user", user=user_payload(user))
 
     if not results:
         logger.warning("⚠️ No search results found.")
         if is_tagged:
             await update.message.reply_text("❓ Sorry, I couldn’t find a relevant answer. Want to rephrase or clarify?")
-        log_staging_qa(question=raw_text, answer=None, user=user.username, chat=chat)
+        outbox.enqueue("staging_qa", question=raw_text, answer=None, user=user.username, chat=chat)
 
         # ⛑ Send to Zammad as unanswered
-        user_info = build_user_info(user)
-        create_ticket(
+        outbox.enqueue(
+            "ticket",
+            user=user_payload(user),
             subject=f"[Unanswered] {text[:40]}",
-            body=f"*Question:* {text}\n\n_No answer found._",
-            user_info=user_info
+            body=f"*Question:* {text}\n\n_No answer found._"
         )
         return
 
@@ -106,15 +170,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not (is_tagged or confident):
         return
 
-    formatted = format_result(top_group) + f"\n⏱️ _Response time: {elapsed:.2f}s_"
-
-    # 📨 Log to Zammad
-    user_info = build_user_info(user)
-    create_ticket(
-        subject=f"[QA] {text[:40]}",
-        body=f"*Question:* {text}\n\n*Answer:*\n{formatted}",
-        user_info=user_info
-    )
+    formatted = format_answer(top_group) + f"\n⏱️ _Response time: {elapsed:.2f}s_"
 
     buttons = InlineKeyboardMarkup([
         [
@@ -124,12 +180,20 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ])
     await update.message.reply_text(formatted, parse_mode="Markdown", reply_markup=buttons)
 
+    # 📨 Log to Zammad once the user already has the answer
+    outbox.enqueue(
+        "ticket",
+        user=user_payload(user),
+        subject=f"[QA] {text[:40]}",
+        body=f"*Question:* {text}\n\n*Answer:*\n{formatted}"
+    )
+
 async def handle_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     try:
         _, index_str, feedback_type = query.data.split("|", 2)
-        increment_feedback(STAGING_SHEET_URL, STAGING_SHEET_TAB, "(untracked)", feedback_type)
+        await run_io(increment_feedback, STAGING_SHEET_URL, STAGING_SHEET_TAB, "(untracked)", feedback_type)
         await query.edit_message_reply_markup(reply_markup=None)
         await query.message.reply_text(f"✅ Thanks for your feedback ({'👍' if 'positive' in feedback_type else '👎'})!")
     except Exception as e:
@@ -139,4 +203,17 @@ async def handle_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # === START BOT ===
 app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 app.add_handler(CallbackQueryHandler(handle_feedback))
+# Load the index and model in the background so polling starts right away;
+# queries that arrive before warm-up finishes simply wait for it
+engine = get_engine()
+engine.warm_up(background=True)
+
+# Pick up rebuilt indexes without a restart: polled, or immediately on `kill -HUP <pid>`
+engine.start_watcher()
+if hasattr(signal, "SIGHUP"):
+    signal.signal(signal.SIGHUP, lambda signum, frame: engine.request_reload())
+outbox.start()
+metrics.start_reporter(METRICS_INTERVAL)
 app.run_polling()
+outbox.stop()
+shutdown_executors()
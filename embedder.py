@@ -1,23 +1,144 @@
+import hashlib
 import logging
-from sentence_transformers import SentenceTransformer
+import re
+import unicodedata
+from pathlib import Path
+
+import numpy as np
 from config.config_loader import load_config_yaml
+from embedding_store import EmbeddingStore
+from ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 # Load config and model name
 config = load_config_yaml()
-MODEL_NAME = config.get("embedding", {}).get("model", "all-MiniLM-L6-v2")
+embedding_config = config.get("embedding", {})
+MODEL_NAME = embedding_config.get("model", "all-MiniLM-L6-v2")
+CACHE_DIR = Path(embedding_config.get("cache_dir", "index/embedding_cache"))
+QUERY_CACHE_SIZE = int(embedding_config.get("query_cache_size", 4096))
+QUERY_CACHE_TTL = float(embedding_config.get("query_cache_ttl", 24 * 3600))
+# torch: full-precision PyTorch; int8: PyTorch with dynamically quantized Linear layers;
+# onnx: ONNX Runtime (needs `sentence-transformers[onnx]>=3.2`), optionally a quantized export via onnx_file
+BACKENDS = ("torch", "int8", "onnx")
+BACKEND = embedding_config.get("backend", "torch")
+THREADS = int(embedding_config.get("threads", 0))  # 0 = library default
+ONNX_FILE = embedding_config.get("onnx_file")
+# Vectors from different backends differ slightly; keep their cache entries and builds apart
+EMBEDDING_ID = MODEL_NAME if BACKEND == "torch" else f"{MODEL_NAME}@{BACKEND}"
 
 _model = None
+_store = None
+_query_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+ONNX_MIN_VERSION = (3, 2)  # first sentence-transformers release with backend="onnx"
+
+def _require_onnx_support():
+    """Fail with an actionable message instead of a TypeError deep inside SentenceTransformer."""
+    import sentence_transformers
+    installed = tuple(int(part) for part in re.findall(r"\d+", sentence_transformers.__version__)[:2])
+    hint = "pip install 'sentence-transformers[onnx]>=3.2'"
+    if installed < ONNX_MIN_VERSION:
+        raise ImportError(f"❌ embedding.backend: onnx needs sentence-transformers>=3.2, "
+                          f"found {sentence_transformers.__version__} ({hint})")
+    for module in ("onnxruntime", "optimum"):
+        try:
+            __import__(module)
+        except ImportError as e:
+            raise ImportError(f"❌ embedding.backend: onnx needs {module} ({hint})", name=module) from e
+
+def load_model(backend: str = BACKEND, threads: int = THREADS):
+    """Load MODEL_NAME on CPU with the given inference backend."""
+    if backend not in BACKENDS:
+        raise ValueError(f"❌ Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    # Imported here: torch + sentence-transformers take seconds to import, and
+    # callers that only need MODEL_NAME/text_key (or hit the cache) shouldn't pay that
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    logger.info(f"🧠 Loading embedding model: {MODEL_NAME} ({backend} backend)")
+    if backend == "onnx":
+        _require_onnx_support()
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        model_kwargs = {"session_options": options}
+        if ONNX_FILE:
+            model_kwargs["file_name"] = ONNX_FILE
+        return SentenceTransformer(MODEL_NAME, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    if backend == "int8":
+        # Dynamic quantization kernels are CPU-only
+        model = SentenceTransformer(MODEL_NAME, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return SentenceTransformer(MODEL_NAME)
 
 def get_embedder():
     global _model
     if _model is None:
-        logger.info(f"🧠 Loading embedding model: {MODEL_NAME}")
-        _model = SentenceTransformer(MODEL_NAME)
+        _model = load_model()
     return _model
 
+def get_embedding_cache() -> EmbeddingStore:
+    global _store
+    if _store is None:
+        _store = EmbeddingStore(CACHE_DIR)
+    return _store
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFKC, collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+def text_key(text: str) -> str:
+    """Content address of a text under the current model."""
+    return hashlib.sha256(f"{EMBEDDING_ID}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
 def embed_texts(texts):
-    model = get_embedder()
-    logger.info(f"📐 Embedding {len(texts)} texts")
-    return model.encode(texts, show_progress_bar=True)
+    """Embed texts, computing only those missing from the on-disk cache."""
+    store = get_embedding_cache()
+    keys = [text_key(t) for t in texts]
+    vectors = store.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in vectors]
+
+    logger.info(f"📐 Embedding {len(missing)} texts ({len(texts) - len(missing)} cached)")
+    if missing:
+        model = get_embedder()
+        encoded = np.asarray(model.encode([texts[i] for i in missing], show_progress_bar=True), dtype=np.float32)
+        # Identical texts within one call share a key; store each key once
+        fresh = dict(zip((keys[i] for i in missing), encoded))
+        store.put_many(list(fresh), np.vstack(list(fresh.values())))
+        vectors.update(fresh)
+
+    return np.vstack([vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+def embed_queries(texts) -> np.ndarray:
+    """
+    Embed a batch of queries. Repeats are served from the in-memory LRU, then the
+    disk cache; whatever is left goes to the model in a single encode call.
+    """
+    keys = [text_key(t) for t in texts]
+    vectors = {}
+    for key in keys:
+        if (vector := _query_cache.get(key)) is not None:
+            vectors[key] = vector
+
+    pending = [key for key in dict.fromkeys(keys) if key not in vectors]
+    if pending:
+        vectors.update(get_embedding_cache().get_many(pending))
+
+    missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+    if missing:
+        encoded = np.asarray(get_embedder().encode(list(missing.values())), dtype=np.float32)
+        vectors.update(zip(missing, encoded))
+
+    for key in pending:
+        _query_cache.set(key, vectors[key])
+    return np.vstack([vectors[key] for key in keys])
+
+def embed_query(text: str) -> np.ndarray:
+    """Embed a single query (see embed_queries)."""
+    return embed_queries([text])[0]
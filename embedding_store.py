@@ -0,0 +1,129 @@
+### embedding_store.py
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """
+    Persistent key → float32 vector store.
+    Vectors live in one append-only raw matrix file read through np.memmap;
+    a JSON snapshot maps each key to its row, and rows added since the snapshot
+    are appended to a key log, so a put costs O(batch) rather than O(store).
+    """
+
+    # Fold the key log into the snapshot once it holds this many entries
+    COMPACT_AFTER = 50_000
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.keys_path = self.directory / "keys.json"
+        self.log_path = self.directory / "keys.log"
+        self.dim = None
+        self.rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._logged = 0
+
+        if self.keys_path.exists():
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.dim = state["dim"]
+            self.rows = state["rows"]
+            self._replay_log()
+            logger.info(f"🗃️ Loaded embedding store with {len(self.rows)} vectors from {self.directory}")
+
+    def _replay_log(self):
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, "rb+") as f:
+            data = f.read()
+            # A torn last line (interrupted write) is dropped; its vector is simply re-embedded
+            complete = data.rfind(b"\n") + 1
+            for line in data[:complete].decode("utf-8").splitlines():
+                key, _, row = line.partition("\t")
+                self.rows[key] = int(row)
+                self._logged += 1
+            if complete < len(data):
+                f.truncate(complete)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _matrix(self) -> np.ndarray:
+        # Re-map only when the file has grown past what the current mapping covers
+        n_rows = self.vectors_path.stat().st_size // (4 * self.dim)
+        if self._mmap is None or self._mmap.shape[0] != n_rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+        return self._mmap
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return vectors for the keys that are present; missing keys are simply absent."""
+        with self._lock:
+            found = [(key, self.rows[key]) for key in keys if key in self.rows]
+            if not found:
+                return {}
+            matrix = self._matrix()
+            return {key: np.array(matrix[row]) for key, row in found}
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._append(keys, vectors)
+
+    def _append(self, keys: List[str], vectors: np.ndarray):
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dim {vectors.shape[1]} does not match store dim {self.dim}")
+
+        row_bytes = 4 * self.dim
+        start = self.vectors_path.stat().st_size // row_bytes if self.vectors_path.exists() else 0
+        with open(self.vectors_path, "ab") as f:
+            # Drop a partial row left by an interrupted write so new rows stay aligned
+            f.truncate(start * row_bytes)
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        for offset, key in enumerate(keys):
+            self.rows[key] = start + offset
+
+        if not self.keys_path.exists() or self._logged + len(keys) > self.COMPACT_AFTER:
+            self._save_keys()
+            return
+        # Vectors are durable before their keys are, so a crash never maps a key to a missing row
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("".join(f"{key}\t{start + offset}\n" for offset, key in enumerate(keys)))
+            f.flush()
+            os.fsync(f.fileno())
+        self._logged += len(keys)
+
+    def _save_keys(self):
+        tmp_path = self.keys_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "rows": self.rows}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.keys_path)
+        # The rename itself is only durable once the directory is synced
+        dir_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        # Everything in the log is now durably in the snapshot
+        open(self.log_path, "w").close()
+        self._logged = 0
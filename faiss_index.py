@@ -0,0 +1,260 @@
+### faiss_index.py
+import logging
+import math
+import time
+from typing import List
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "pq")
+
+# How flat/ivf_flat/hnsw store each vector: 4, 2 or 1 byte(s) per dimension
+STORAGE = {"float32": "Flat", "fp16": "SQfp16", "sq8": "SQ8"}
+
+# l2: squared L2 over raw embeddings; cosine: inner product over L2-normalized embeddings
+METRICS = {"l2": faiss.METRIC_L2, "cosine": faiss.METRIC_INNER_PRODUCT}
+
+# Keys under `index:` that change how the index is built (search-time knobs excluded)
+BUILD_KEYS = ("type", "nlist", "pq_m", "pq_nbits", "hnsw_m", "ef_construction", "storage", "metric")
+
+
+def build_params(index_cfg: dict) -> dict:
+    """The subset of the index config that requires a rebuild when it changes."""
+    return {key: index_cfg.get(key) for key in BUILD_KEYS}
+
+
+def pq_trainable(n_vectors: int, pq_nbits: int) -> bool:
+    # k-means wants ~39 points per centroid: with fewer than 2**nbits it fails outright, and
+    # short of 39x it is slow (minutes for a few hundred vectors) and its codebooks are poor
+    return n_vectors >= 39 * 2 ** pq_nbits
+
+
+def factory_string(index_cfg: dict, n_vectors: int) -> str:
+    index_type = index_cfg.get("type", "flat")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"❌ Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    storage = index_cfg.get("storage", "float32")
+    if storage not in STORAGE:
+        raise ValueError(f"❌ Unknown index storage '{storage}', expected one of {tuple(STORAGE)}")
+    codes = STORAGE[storage]
+
+    if index_type == "flat":
+        return codes
+    if index_type == "hnsw":
+        hnsw = f"HNSW{int(index_cfg.get('hnsw_m', 32))}"
+        return hnsw if storage == "float32" else f"{hnsw}_{codes}"
+    if index_type == "pq":
+        pq_m, pq_nbits = int(index_cfg.get("pq_m", 16)), int(index_cfg.get("pq_nbits", 8))
+        # Small inputs (e.g. a service shard with a few hundred chunks) are stored as SQ8 instead
+        if not pq_trainable(n_vectors, pq_nbits):
+            logger.warning(f"⚠️ {n_vectors} vectors are too few to train PQ{pq_m}x{pq_nbits}, using SQ8")
+            return "SQ8"
+        return f"PQ{pq_m}x{pq_nbits}"
+
+    # FAISS wants ~39 training points per centroid; default to ~4·sqrt(n) lists
+    nlist = int(index_cfg.get("nlist") or 4 * math.sqrt(n_vectors))
+    nlist = max(1, min(nlist, n_vectors // 39))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},{codes}"
+
+    pq_m = int(index_cfg.get("pq_m", 16))
+    pq_nbits = int(index_cfg.get("pq_nbits", 8))
+    if not pq_trainable(n_vectors, pq_nbits):
+        logger.warning(f"⚠️ {n_vectors} vectors are too few to train PQ{pq_m}x{pq_nbits}, using IVF-Flat")
+        return f"IVF{nlist},Flat"
+    return f"IVF{nlist},PQ{pq_m}x{pq_nbits}"
+
+
+def needs_training(index_cfg: dict) -> bool:
+    # IVF learns centroids, PQ codebooks, SQ8 per-dimension ranges
+    return index_cfg.get("type", "flat") in ("ivf_flat", "ivf_pq", "pq") or index_cfg.get("storage") == "sq8"
+
+
+def metric_type(index_cfg: dict) -> int:
+    metric = index_cfg.get("metric", "l2")
+    if metric not in METRICS:
+        raise ValueError(f"❌ Unknown index metric '{metric}', expected one of {tuple(METRICS)}")
+    return METRICS[metric]
+
+
+def prepare_vectors(vectors: np.ndarray, metric: int) -> np.ndarray:
+    """Vectors as they go into (or query) an index of the given metric: L2-normalized for inner product."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if metric == faiss.METRIC_INNER_PRODUCT:
+        vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+    return vectors
+
+
+def to_distances(scores: np.ndarray, metric: int) -> np.ndarray:
+    """
+    FAISS scores as lower-is-better distances: squared L2 as is, inner product of
+    normalized vectors as cosine distance (1 - cosine similarity, 0..2).
+    """
+    return 1 - scores if metric == faiss.METRIC_INNER_PRODUCT else scores
+
+
+def create_index(index_cfg: dict, train_vectors: np.ndarray, n_vectors: int = None) -> faiss.Index:
+    """
+    Build (and train, if needed) an empty index that takes chunk ids via add_with_ids.
+    `n_vectors` is the eventual corpus size when training on a sample of it.
+    """
+    dim = train_vectors.shape[1]
+    factory = factory_string(index_cfg, n_vectors or len(train_vectors))
+    base = faiss.index_factory(dim, factory, metric_type(index_cfg))
+
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efConstruction = int(index_cfg.get("ef_construction", 200))
+    if not base.is_trained:
+        logger.info(f"🏋️ Training {factory} on {len(train_vectors)} vectors")
+        base.train(train_vectors)
+
+    logger.info(f"🧩 Created FAISS index: {factory} ({index_cfg.get('metric', 'l2')})")
+    if isinstance(base, faiss.IndexIVF):
+        # IVF stores ids natively. An IDMap on top would go out of sync on remove_ids (the map
+        # compacts, IVF's own ids don't); a hashtable direct map allows reconstruct on sparse ids.
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index = base
+    else:
+        index = faiss.IndexIDMap2(base)
+    apply_search_params(index, index_cfg)
+    return index
+
+
+def _base_index(index: faiss.Index) -> faiss.Index:
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+
+def apply_search_params(index: faiss.Index, index_cfg: dict):
+    """Set nprobe (IVF) / efSearch (HNSW) on a loaded index."""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = int(index_cfg.get("nprobe", 8))
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = int(index_cfg.get("ef_search", 64))
+
+
+def enable_reconstruct(index: faiss.Index):
+    """Let index.reconstruct(id) work (IVF needs a direct map); used to score lexical-only hits."""
+    base = _base_index(index)
+    # A hashtable, not the array map: ids are sparse once chunks have been removed
+    if isinstance(base, faiss.IndexIVF) and base.direct_map.type != faiss.DirectMap.Hashtable:
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+
+def filtered_search(index: faiss.Index, vectors: np.ndarray, k: int, mask: np.ndarray,
+                    max_widenings: int = 4):
+    """
+    Search only ids with mask[id] set, filtering inside the scan with an IDSelectorBitmap.
+    Approximate indexes widen nprobe / efSearch (doubling, up to `max_widenings` times)
+    until every query has min(k, matching ids) hits. Indexes without selector support
+    (plain PQ) fall back to over-fetching and post-filtering, widening k the same way.
+    """
+    want = min(k, int(mask.sum()))
+    if want == 0:
+        return np.full((len(vectors), k), np.inf, dtype=np.float32), np.full((len(vectors), k), -1, dtype=np.int64)
+
+    bits = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bits))
+    base = _base_index(index)
+    for widening in range(max_widenings + 1):
+        scale = 2 ** widening
+        if isinstance(base, faiss.IndexIVF):
+            nprobe = min(base.nprobe * scale, base.nlist)
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+            exhaustive = nprobe == base.nlist
+        elif isinstance(base, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=max(base.hnsw.efSearch, k) * scale)
+            exhaustive = False
+        else:
+            params = faiss.SearchParameters(sel=selector)
+            exhaustive = True
+        try:
+            D, I = index.search(vectors, k, params=params)
+        except RuntimeError:
+            return _post_filtered_search(index, vectors, k, mask, want, max_widenings)
+        if exhaustive or (I >= 0).sum(axis=1).min() >= want:
+            break
+        logger.debug(f"🔎 Filtered search found too few hits, widening ×{scale * 2}")
+    return D, I
+
+
+def _post_filtered_search(index: faiss.Index, vectors: np.ndarray, k: int, mask: np.ndarray,
+                          want: int, max_widenings: int):
+    # Expect roughly k / selectivity candidates to contain k matching ones
+    fetch = k * max(1, math.ceil(len(mask) / max(1, int(mask.sum()))))
+    for _ in range(max_widenings + 1):
+        fetch = min(fetch, index.ntotal)
+        D, I = index.search(vectors, fetch)
+        keep = (I >= 0) & mask[np.clip(I, 0, len(mask) - 1)]
+        if fetch >= index.ntotal or keep.sum(axis=1).min() >= want:
+            break
+        fetch *= 2
+
+    out_D = np.full((len(vectors), k), np.inf, dtype=np.float32)
+    out_I = np.full((len(vectors), k), -1, dtype=np.int64)
+    for row in range(len(vectors)):
+        columns = np.flatnonzero(keep[row])[:k]
+        out_D[row, :len(columns)] = D[row, columns]
+        out_I[row, :len(columns)] = I[row, columns]
+    return out_D, out_I
+
+
+def supports_remove(index: faiss.Index) -> bool:
+    # HNSW graphs can't drop nodes. IVF can, but only with its native ids: indexes built
+    # before that wrap IVF in an IDMap, which remove_ids would desync, so they are rebuilt.
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return False
+    return not (isinstance(base, faiss.IndexIVF) and isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)))
+
+
+def recall_report(index: faiss.Index, vectors: np.ndarray, ids: np.ndarray, index_cfg: dict,
+                  k: int = 10, n_queries: int = 200) -> List[dict]:
+    """
+    Measure recall@k and per-query latency of `index` against an exact flat scan,
+    sweeping nprobe (IVF) or efSearch (HNSW). Queries are sampled from the corpus.
+    """
+    vectors = prepare_vectors(vectors, index.metric_type)
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+
+    exact = faiss.IndexFlat(vectors.shape[1], index.metric_type)
+    exact.add(vectors)
+    started = time.perf_counter()
+    _, exact_rows = exact.search(queries, k)
+    flat_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    truth = [set(ids[row[row >= 0]].tolist()) for row in exact_rows]
+
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        param, values = "nprobe", [v for v in (1, 2, 4, 8, 16, 32, 64, 128) if v <= base.nlist]
+    elif isinstance(base, faiss.IndexHNSW):
+        param, values = "efSearch", [16, 32, 64, 128, 256]
+    else:
+        param, values = None, [None]
+
+    rows = []
+    for value in values:
+        if param:
+            apply_search_params(index, {**index_cfg, "nprobe": value, "ef_search": value})
+        started = time.perf_counter()
+        _, found = index.search(queries, k)
+        ann_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        recall = np.mean([len(truth[i] & set(found[i].tolist())) / max(1, len(truth[i])) for i in range(len(queries))])
+        rows.append({
+            "param": param,
+            "value": value,
+            f"recall@{k}": round(float(recall), 4),
+            "ms_per_query": round(ann_ms, 4),
+            "flat_ms_per_query": round(flat_ms, 4),
+        })
+
+    apply_search_params(index, index_cfg)
+    return rows
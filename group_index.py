@@ -0,0 +1,170 @@
+### group_index.py
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sources whose groups form one answer (a video's summary, steps and FAQ). Sheet groups are
+# a whole tab of unrelated rows, so only the rows that actually matched are shown for those.
+EXPANDED_SOURCES = frozenset({"video"})
+
+
+# Chunk fields search results can be filtered on, e.g. {"type": "faq", "service": ["billing", "app"]}
+FILTER_KEYS = ("source", "type", "service", "origin")
+
+# Canonical, hashable form of a filter dict: ((key, (value, ...)), ...) sorted by key
+Filters = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+def service_of(chunk: dict) -> str:
+    return chunk.get("service") or "general"
+
+
+def normalize_filters(filters: Optional[Dict[str, Union[str, Iterable[str]]]]) -> Filters:
+    if not filters:
+        return ()
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"❌ Unknown filter field(s) {sorted(unknown)}, expected some of {FILTER_KEYS}")
+    return tuple(
+        (key, (value,) if isinstance(value, str) else tuple(sorted(value)))
+        for key, value in sorted(filters.items())
+    )
+
+
+class GroupIndexBuilder:
+    """
+    Assigns an integer group id per (origin, source), and records each chunk's
+    service and type codes, while chunks stream through the indexer.
+    """
+
+    def __init__(self):
+        self._group_ids: Dict[Tuple[str, str], int] = {}
+        self._group_of: Dict[int, int] = {}
+        self._service_ids: Dict[str, int] = {}
+        self._type_ids: Dict[str, int] = {}
+        self._codes: Dict[int, Tuple[int, int]] = {}  # chunk id -> (service code, type code)
+
+    def add(self, chunk_id: int, chunk: dict):
+        key = (chunk["origin"], chunk["source"])
+        self._group_of[chunk_id] = self._group_ids.setdefault(key, len(self._group_ids))
+        self._codes[chunk_id] = (
+            self._service_ids.setdefault(service_of(chunk), len(self._service_ids)),
+            self._type_ids.setdefault(chunk.get("type", ""), len(self._type_ids)),
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        group_of = np.full(max(self._group_of, default=-1) + 1, -1, dtype=np.int32)
+        service_codes = np.full(len(group_of), -1, dtype=np.int32)
+        type_codes = np.full(len(group_of), -1, dtype=np.int32)
+        for chunk_id, group_id in self._group_of.items():
+            group_of[chunk_id] = group_id
+            service_codes[chunk_id], type_codes[chunk_id] = self._codes[chunk_id]
+
+        # CSR layout: members of group g are members[offsets[g]:offsets[g + 1]], in chunk id order
+        chunk_ids = np.flatnonzero(group_of >= 0)
+        members = chunk_ids[np.argsort(group_of[chunk_ids], kind="stable")]
+        offsets = np.zeros(len(self._group_ids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(group_of[chunk_ids], minlength=len(self._group_ids)))
+
+        keys = sorted(self._group_ids, key=self._group_ids.get)
+        return {
+            "group_of": group_of,
+            "offsets": offsets,
+            "members": members.astype(np.int64),
+            "origins": np.array([origin for origin, _ in keys], dtype=str),
+            "sources": np.array([source for _, source in keys], dtype=str),
+            "service_of": service_codes,
+            "services": np.array(sorted(self._service_ids, key=self._service_ids.get), dtype=str),
+            "type_of": type_codes,
+            "types": np.array(sorted(self._type_ids, key=self._type_ids.get), dtype=str),
+        }
+
+    def save(self, path: Path):
+        arrays = self.arrays()
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+        logger.info(f"🗂️ Group index saved: {len(arrays['origins'])} groups → {path}")
+
+
+class GroupIndex:
+    """
+    Chunk id → group id / service / type lookups plus each group's member ids as a CSR slice.
+    Also answers metadata filters as a boolean mask over chunk ids.
+    """
+
+    MASK_CACHE_SIZE = 64
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.group_of = arrays["group_of"]
+        self.offsets = arrays["offsets"]
+        self.members = arrays["members"]
+        self.origins = arrays["origins"].tolist()
+        self.sources = arrays["sources"].tolist()
+        self.service_of = arrays["service_of"]
+        self.services = arrays["services"].tolist()
+        self.type_of = arrays["type_of"]
+        self.types = arrays["types"].tolist()
+        self.expand = np.array([source in EXPANDED_SOURCES for source in self.sources], dtype=bool)
+        self._masks: Dict[Filters, np.ndarray] = {}
+        self._masks_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path) -> "GroupIndex":
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    @classmethod
+    def from_metadata(cls, metadata: Iterable[Tuple[int, dict]]) -> "GroupIndex":
+        """Rebuild from (chunk_id, chunk) pairs, for versions written before the group artifact existed."""
+        builder = GroupIndexBuilder()
+        for chunk_id, chunk in metadata:
+            builder.add(chunk_id, chunk)
+        return cls(builder.arrays())
+
+    def __len__(self) -> int:
+        return len(self.origins)
+
+    def _matching(self, codes: np.ndarray, vocabulary: list, values: Tuple[str, ...]) -> np.ndarray:
+        wanted = [vocabulary.index(value) for value in values if value in vocabulary]
+        return np.isin(codes, wanted) & (codes >= 0)
+
+    def filter_mask(self, filters: Filters) -> np.ndarray:
+        """Boolean mask over chunk ids (index = id) of chunks matching every filter field."""
+        with self._masks_lock:
+            mask = self._masks.get(filters)
+        if mask is not None:
+            return mask
+
+        mask = self.group_of >= 0
+        for key, values in filters:
+            if key == "service":
+                mask &= self._matching(self.service_of, self.services, values)
+            elif key == "type":
+                mask &= self._matching(self.type_of, self.types, values)
+            else:
+                # source and origin are per group: match groups, then map chunks to their group
+                group_values = self.sources if key == "source" else self.origins
+                groups = np.array([value in values for value in group_values] + [False], dtype=bool)
+                mask &= groups[self.group_of]  # group_of == -1 picks the trailing False
+
+        with self._masks_lock:
+            if len(self._masks) >= self.MASK_CACHE_SIZE:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[filters] = mask
+        return mask
+
+    def matches(self, ids: np.ndarray, filters: Filters) -> np.ndarray:
+        """Which of `ids` pass the filters (ids outside the id space never do)."""
+        mask = self.filter_mask(filters)
+        known = (ids >= 0) & (ids < len(mask))
+        result = np.zeros(len(ids), dtype=bool)
+        result[known] = mask[ids[known]]
+        return result
+
+    def member_ids(self, group_id: int) -> np.ndarray:
+        return self.members[self.offsets[group_id]:self.offsets[group_id + 1]]
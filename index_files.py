@@ -0,0 +1,90 @@
+### index_files.py
+"""
+Versioned on-disk layout shared by the indexer (writer) and search (reader):
+
+    <index.dir>/CURRENT                   name of the live version
+    <index.dir>/versions/<version>/...    one complete, immutable build per version
+                                          (global index plus one shard per service)
+
+A build is written into a fresh version directory and only becomes visible once
+CURRENT is atomically replaced, so readers never see a half-written index.
+"""
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from config.config_loader import load_config_yaml
+
+logger = logging.getLogger(__name__)
+
+config = load_config_yaml()
+index_config = config.get("index", {})
+INDEX_DIR = Path(index_config.get("dir", "index"))
+VERSIONS_DIR = INDEX_DIR / "versions"
+CURRENT_FILE = INDEX_DIR / "CURRENT"
+KEEP_VERSIONS = int(index_config.get("keep_versions", 3))
+
+ARTIFACTS = {
+    "index": index_config.get("name", "qa_index.faiss"),
+    "metadata": index_config.get("metadata", "qa_metadata.bin"),
+    "manifest": "manifest.json",
+    "lexical": "qa_lexical.npz",
+    "groups": "qa_groups.npz",
+    "shards": "shards",  # directory: one FAISS index per service
+}
+
+
+def new_version() -> str:
+    # Lexically sortable by creation time (UTC, ns precision), unique across concurrent builders
+    ns = time.time_ns()
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(ns // 10**9))}.{ns % 10**9:09d}-{uuid.uuid4().hex[:6]}"
+
+
+def version_dir(version: str) -> Path:
+    return VERSIONS_DIR / version
+
+
+def paths(version: str) -> Dict[str, Path]:
+    directory = version_dir(version)
+    return {name: directory / filename for name, filename in ARTIFACTS.items()}
+
+
+def shard_path(version: str, service: str) -> Path:
+    filename = re.sub(r"[^\w.-]", "_", service)
+    return paths(version)["shards"] / f"{filename}.faiss"
+
+
+def current_version() -> Optional[str]:
+    try:
+        version = CURRENT_FILE.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def publish(version: str):
+    """Atomically point CURRENT at a fully written version."""
+    tmp_path = CURRENT_FILE.with_name(f"CURRENT.{uuid.uuid4().hex[:6]}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CURRENT_FILE)
+    logger.info(f"🚀 Published index version {version}")
+
+
+def prune(keep: int = KEEP_VERSIONS):
+    """Delete all but the newest `keep` versions (never the live one)."""
+    if not VERSIONS_DIR.exists():
+        return
+    live = current_version()
+    versions = sorted(p for p in VERSIONS_DIR.iterdir() if p.is_dir())
+    for directory in versions[:-keep] if keep > 0 else versions:
+        if directory.name != live:
+            shutil.rmtree(directory, ignore_errors=True)
+            logger.info(f"🧹 Removed old index version {directory.name}")
@@ -1,12 +1,25 @@
+import argparse
+import hashlib
 import logging
 import json
-from pathlib import Path
-from sentence_transformers import SentenceTransformer
+import queue
+import shutil
+import threading
+from collections import Counter
+from typing import Iterator, List, Tuple
+import numpy as np
 import faiss
 
+import index_files
 from config.config_loader import load_config_yaml
-from video.video_qa_extractor import extract_all_video_chunks
-from sheets.sheet_qa_extractor import extract_all_sheet_chunks
+from embedder import EMBEDDING_ID, embed_texts
+from metadata_store import MetadataStore, MetadataWriter
+from lexical_index import LexicalIndexBuilder
+from group_index import GroupIndexBuilder, service_of
+from faiss_index import (build_params, create_index, metric_type, needs_training, prepare_vectors,
+                         recall_report, supports_remove)
+from video.video_qa_extractor import iter_video_chunks
+from sheets.sheet_qa_extractor import iter_sheet_chunks
 
 # === Logging Setup ===
 logger = logging.getLogger(__name__)
@@ -14,64 +27,253 @@ logging.basicConfig(level=logging.INFO)
 
 # === Load Config ===
 config = load_config_yaml()
-MODEL_NAME = config.get("embedding", {}).get("model", "all-MiniLM-L6-v2")
 index_config = config.get("index", {})
+# Texts are embedded and added to FAISS this many at a time, so memory doesn't grow with the corpus
+EMBED_BATCH_SIZE = int(index_config.get("embed_batch_size", 512))
+# IVF indexes are trained on a random sample of at most this many vectors
+TRAIN_SAMPLE_SIZE = int(index_config.get("train_sample_size", 50_000))
 
-INDEX_DIR = Path(index_config.get("dir", "index"))
-INDEX_FILE = INDEX_DIR / index_config.get("name", "qa_index.faiss")
-META_FILE = INDEX_DIR / index_config.get("metadata", "qa_metadata.json")
+index_files.INDEX_DIR.mkdir(exist_ok=True)
 
-INDEX_DIR.mkdir(exist_ok=True)
 
+def chunk_hash(chunk: dict) -> str:
+    """Content hash over the chunk text and all of its metadata."""
+    return hashlib.sha256(json.dumps(chunk, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
 
-def build_index():
-    logger.info("📦 Starting index build...")
 
-    # Step 1: Load data chunks
-    video_chunks = extract_all_video_chunks()
-    logger.info(f"🎥 Extracted {len(video_chunks)} chunks from enriched video data")
+def iter_source_chunks() -> Iterator[Tuple[str, List[dict]]]:
+    """
+    Run video and sheet extraction concurrently (each on its own pool) and yield
+    (source, chunks) per video file / sheet as soon as it is extracted.
+    """
+    producers = {"video": iter_video_chunks, "sheet": iter_sheet_chunks}
+    results = queue.Queue()
+
+    def drain(source, produce):
+        try:
+            for chunks in produce():
+                results.put((source, chunks))
+            results.put((source, None))
+        except Exception as e:
+            results.put((source, e))
+
+    for source, produce in producers.items():
+        threading.Thread(target=drain, args=(source, produce), name=f"extract-{source}", daemon=True).start()
+
+    pending = len(producers)
+    while pending:
+        source, item = results.get()
+        if item is None:
+            pending -= 1
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            yield source, item
+
+
+def training_sample(metadata: list, chunk_ids: list = None) -> np.ndarray:
+    """Vectors to train a fresh index on: a random sample for IVF, a single row otherwise (dim only)."""
+    if chunk_ids is None:
+        chunk_ids = [chunk_id for chunk_id, chunk in enumerate(metadata) if chunk is not None]
+    size = min(len(chunk_ids), TRAIN_SAMPLE_SIZE) if needs_training(index_config) else 1
+    sample = np.random.default_rng(0).choice(chunk_ids, size=size, replace=False)
+    vectors = embed_texts([metadata[chunk_id]["text"] for chunk_id in sorted(sample)])
+    return prepare_vectors(vectors, metric_type(index_config))
+
+
+def load_previous_build():
+    """Return (version, index, metadata, manifest) of the live version, or None if it can't be reused."""
+    version = index_files.current_version()
+    if version is None:
+        return None
+    files = index_files.paths(version)
+    if not all(files[name].exists() for name in ("index", "metadata", "manifest")):
+        return None
+
+    with open(files["manifest"], "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("model") != EMBEDDING_ID:
+        logger.info(f"🔁 Embedding model changed ({manifest.get('model')} → {EMBEDDING_ID}), doing a full build")
+        return None
+
+    index = faiss.read_index(str(files["index"]))
+    store = MetadataStore(files["metadata"])
+    metadata = [store.get(chunk_id) for chunk_id in range(len(store))]
+    # Trailing removed ids are not in the offset table; pad so list position == id again
+    metadata.extend([None] * (manifest["next_id"] - len(metadata)))
+    return version, index, metadata, manifest
+
+
+def build_index(incremental: bool = True):
+    logger.info("📦 Starting index build...")
 
-    sheet_chunks = extract_all_sheet_chunks()
-    logger.info(f"📄 Extracted {len(sheet_chunks)} chunks from Google Sheets")
+    # Steps 1-2: Extract all sources concurrently; validate and hash chunks as they arrive
+    # (exact duplicates collapse into one)
+    current = {}
+    extracted = Counter()
+    for source, chunks in iter_source_chunks():
+        for chunk in chunks:
+            if "text" not in chunk:
+                logger.warning(f"⚠️ Missing 'text' field in {source} chunk: {chunk}")
+                continue
+            current.setdefault(chunk_hash(chunk), chunk)
+        extracted[source] += len(chunks)
 
-    all_chunks = video_chunks + sheet_chunks
-    logger.info(f"🧱 Total chunks to index: {len(all_chunks)}")
+    logger.info(f"🎥 Extracted {extracted['video']} chunks from enriched video data")
+    logger.info(f"📄 Extracted {extracted['sheet']} chunks from Google Sheets")
+    logger.info(f"🧱 Total chunks to index: {sum(extracted.values())}")
 
-    if not all_chunks:
+    if not sum(extracted.values()):
         logger.error("❌ No chunks available for indexing. Exiting.")
         return
 
-    # Step 2: Validate chunk structure
-    for i, chunk in enumerate(all_chunks):
-        if "text" not in chunk:
-            logger.warning(f"⚠️ Missing 'text' field in chunk {i}: {chunk}")
+    if not current:
+        logger.error("❌ No valid chunks to index. Exiting.")
+        return
 
-    texts = [chunk["text"] for chunk in all_chunks if "text" in chunk]
+    # Step 3: Diff against the previous build
+    previous = load_previous_build() if incremental else None
+    if previous:
+        previous_version, index, metadata, manifest = previous
+        known = manifest["chunks"]
+        next_id = manifest["next_id"]
+    else:
+        previous_version, index, metadata, manifest, known, next_id = None, None, [], {}, {}, 0
 
-    # Step 3: Embeddings
-    logger.info(f"🧠 Loading embedding model: {MODEL_NAME}")
-    model = SentenceTransformer(MODEL_NAME)
+    removed = {h: chunk_id for h, chunk_id in known.items() if h not in current}
+    added = [h for h in current if h not in known]
+    logger.info(f"🧮 Diff: {len(added)} new/changed, {len(removed)} removed, {len(current) - len(added)} unchanged")
 
-    embeddings = model.encode(texts, show_progress_bar=True)
-    logger.info(f"📐 Generated {len(embeddings)} embeddings of dimension {embeddings.shape[1]}")
+    # Services whose chunk set changed need their shard rebuilt; the others are carried over
+    changed_services = {service_of(metadata[chunk_id]) for chunk_id in removed.values()}
+    changed_services.update(service_of(current[h]) for h in added)
 
-    # Step 4: FAISS index
-    index = faiss.IndexFlatL2(embeddings.shape[1])
-    index.add(embeddings)
+    # Step 4: Assign ids — unchanged chunks keep theirs, removed ones leave a null metadata slot
+    for chunk_id in removed.values():
+        metadata[chunk_id] = None
+    known = {h: chunk_id for h, chunk_id in known.items() if h not in removed}
+    added_ids = np.arange(next_id, next_id + len(added), dtype=np.int64)
+    known.update(zip(added, added_ids.tolist()))
+    metadata.extend(current[h] for h in added)
+    next_id += len(added)
 
-    if index.ntotal != len(texts):
-        logger.warning(f"⚠️ FAISS index count mismatch: index={index.ntotal}, embeddings={len(texts)}")
+    # Step 5: FAISS index — patched in place when possible, otherwise rebuilt. Unchanged
+    # chunks' vectors come from the embedding cache, so only new/changed texts reach the model.
+    reuse = (
+        index is not None
+        and manifest.get("index_params") == build_params(index_config)
+        and (not removed or supports_remove(index))
+    )
+    if reuse:
+        if removed:
+            index.remove_ids(np.array(list(removed.values()), dtype=np.int64))
+        to_embed = set(added_ids.tolist())
+    else:
+        index = create_index(index_config, training_sample(metadata), n_vectors=len(current))
+        to_embed = None  # everything
+
+    # Everything goes into a fresh version directory; readers only see it after publish()
+    version = index_files.new_version()
+    files = index_files.paths(version)
+    files["shards"].mkdir(parents=True)
+
+    # Per-service shards (same ids as the global index): copied from the previous version when
+    # the service is unchanged and the index params match, otherwise built in the pass below
+    service_ids = {}
+    for chunk_id, chunk in enumerate(metadata):
+        if chunk is not None:
+            service_ids.setdefault(service_of(chunk), []).append(chunk_id)
+    shards = {}
+    for service, chunk_ids in service_ids.items():
+        previous_shard = index_files.shard_path(previous_version, service) if previous_version else None
+        if reuse and service not in changed_services and previous_shard.exists():
+            shutil.copyfile(previous_shard, index_files.shard_path(version, service))
+        else:
+            shards[service] = create_index(index_config, training_sample(metadata, chunk_ids), n_vectors=len(chunk_ids))
+    logger.info(f"🧩 Shards: {len(shards)} rebuilt, {len(service_ids) - len(shards)} unchanged")
+
+    # Step 6: One streaming pass in id order, EMBED_BATCH_SIZE chunks at a time: embed and add
+    # the batch to FAISS, and write its metadata (addressable by FAISS id; removed chunks simply
+    # have no record), BM25 postings and (origin, source) groups. Every encoded batch is
+    # checkpointed in the embedding cache, so rerunning an interrupted build only encodes
+    # what it hadn't reached.
+    lexical = LexicalIndexBuilder()
+    groups = GroupIndexBuilder()
+    with MetadataWriter(files["metadata"]) as writer:
+        for start in range(0, next_id, EMBED_BATCH_SIZE):
+            batch = [
+                (chunk_id, metadata[chunk_id]) for chunk_id in range(start, min(start + EMBED_BATCH_SIZE, next_id))
+                if metadata[chunk_id] is not None
+            ]
+            for chunk_id, chunk in batch:
+                writer.write(chunk_id, chunk)
+                lexical.add(chunk_id, f"{chunk.get('title') or ''}\n{chunk['text']}")
+                groups.add(chunk_id, chunk)
+
+            pending = [
+                (chunk_id, chunk) for chunk_id, chunk in batch
+                if to_embed is None or chunk_id in to_embed or service_of(chunk) in shards
+            ]
+            if pending:
+                vectors = prepare_vectors(embed_texts([chunk["text"] for _, chunk in pending]), index.metric_type)
+                ids = np.array([chunk_id for chunk_id, _ in pending], dtype=np.int64)
+                into_global = np.array([to_embed is None or chunk_id in to_embed for chunk_id, _ in pending])
+                if into_global.any():
+                    index.add_with_ids(vectors[into_global], ids[into_global])
+                services = np.array([service_of(chunk) for _, chunk in pending])
+                for service in shards.keys() & set(services.tolist()):
+                    in_service = services == service
+                    shards[service].add_with_ids(vectors[in_service], ids[in_service])
+                logger.info(f"🧱 Indexed up to id {batch[-1][0]} ({index.ntotal}/{len(current)} vectors)")
+    logger.info(f"📝 Metadata saved to: {files['metadata']}")
+    lexical.save(files["lexical"])
+    groups.save(files["groups"])
+
+    if index.ntotal != len(current):
+        logger.warning(f"⚠️ FAISS index count mismatch: index={index.ntotal}, chunks={len(current)}")
     else:
         logger.info("✅ FAISS index built successfully")
 
-    faiss.write_index(index, str(INDEX_FILE))
-    logger.info(f"💾 FAISS index saved to: {INDEX_FILE}")
+    faiss.write_index(index, str(files["index"]))
+    for service, shard in shards.items():
+        faiss.write_index(shard, str(index_files.shard_path(version, service)))
+    logger.info(f"💾 FAISS index saved to: {files['index']} (+{len(service_ids)} service shards)")
+
+    with open(files["manifest"], "w", encoding="utf-8") as f:
+        json.dump({
+            "model": EMBEDDING_ID,
+            "index_params": build_params(index_config),
+            "next_id": next_id,
+            "chunks": known
+        }, f)
+
+    # Step 7: Switch readers over to the new version
+    index_files.publish(version)
+    index_files.prune()
+
+    return index, known, version
+
+
+def write_recall_report(index, known: dict, version: str, k: int = 10):
+    """Compare the configured ANN index against an exact flat scan and save the result."""
+    by_id = sorted(known.values())
+    metadata = MetadataStore(index_files.paths(version)["metadata"])
+    vectors = embed_texts([metadata[chunk_id]["text"] for chunk_id in by_id])
+    rows = recall_report(index, vectors, np.array(by_id, dtype=np.int64), index_config, k=k)
 
-    # Step 5: Metadata
-    with open(META_FILE, "w", encoding="utf-8") as f:
-        json.dump(all_chunks, f, ensure_ascii=False, indent=2)
-    logger.info(f"📝 Metadata saved to: {META_FILE}")
+    for row in rows:
+        logger.info(f"🎯 {row}")
+    report_file = index_files.version_dir(version) / "recall_report.json"
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    logger.info(f"📊 Recall/latency report saved to: {report_file}")
 
 
 if __name__ == "__main__":
-    build_index()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the FAISS Q&A index")
+    parser.add_argument("--full", action="store_true", help="Ignore the previous build and re-index everything")
+    parser.add_argument("--report", action="store_true", help="Measure recall and latency against a flat index")
+    args = parser.parse_args()
+    built = build_index(incremental=not args.full)
+    if built and args.report:
+        write_recall_report(*built)
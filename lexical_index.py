@@ -0,0 +1,118 @@
+### lexical_index.py
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import FrozenSet, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keeps product names, versions and error codes ("E-1042", "v2.3.1") as single tokens
+TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+# Tokens with a digit or an inner separator: error codes, versions, ids ("e-1042", "v2.3.1", "403")
+IDENTIFIER_RE = re.compile(r"\d|[-./]")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it my of on or the this to "
+    "what when where which why with you your q".split()
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalIndexBuilder:
+    """Accumulates per-term postings while chunks stream through the indexer."""
+
+    def __init__(self):
+        self._postings = defaultdict(list)  # term -> [(chunk_id, tf)]
+        self._doc_len = {}
+
+    def add(self, chunk_id: int, text: str):
+        counts = Counter(tokenize(text))
+        self._doc_len[chunk_id] = sum(counts.values())
+        for term, tf in counts.items():
+            self._postings[term].append((chunk_id, tf))
+
+    def save(self, path: Path):
+        vocab = sorted(self._postings)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        ids, tfs = [], []
+        for i, term in enumerate(vocab):
+            postings = self._postings[term]
+            offsets[i + 1] = offsets[i] + len(postings)
+            ids.extend(chunk_id for chunk_id, _ in postings)
+            tfs.extend(tf for _, tf in postings)
+
+        doc_len = np.zeros(max(self._doc_len, default=-1) + 1, dtype=np.float32)
+        for chunk_id, length in self._doc_len.items():
+            doc_len[chunk_id] = length
+
+        # np.savez appends .npz to names without it; write to the exact path instead
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                vocab=np.array(vocab, dtype=str),
+                offsets=offsets,
+                ids=np.array(ids, dtype=np.int64),
+                tfs=np.array(tfs, dtype=np.float32),
+                doc_len=doc_len,
+                n_docs=np.int64(len(self._doc_len)),
+            )
+        logger.info(f"🔤 Lexical index saved: {len(vocab)} terms, {len(ids)} postings → {path}")
+
+
+class LexicalIndex:
+    """BM25 over CSR postings arrays (term → slice of chunk ids / term frequencies)."""
+
+    def __init__(self, path: Path):
+        with np.load(path) as data:
+            vocab = data["vocab"]
+            self.offsets = data["offsets"]
+            self.ids = data["ids"]
+            self.tfs = data["tfs"]
+            self.doc_len = data["doc_len"]
+            self.n_docs = int(data["n_docs"])
+        self.term_ids = {term: i for i, term in enumerate(vocab.tolist())}
+        self.avg_len = float(self.doc_len.sum() / max(1, self.n_docs))
+
+    def identifier_terms(self, query: str) -> FrozenSet[str]:
+        """The query's identifier-like terms (see IDENTIFIER_RE) that occur in the corpus."""
+        return frozenset(term for term in tokenize(query) if IDENTIFIER_RE.search(term) and term in self.term_ids)
+
+    def search(self, query: str, top_k: int = 20, mask: np.ndarray = None) -> List[Tuple[int, float]]:
+        """Return up to top_k (chunk_id, bm25_score), best first; with `mask`, only ids where mask[id] is set."""
+        id_parts, score_parts = [], []
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            ids, tfs = self.ids[start:end], self.tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[ids] / self.avg_len)
+            id_parts.append(ids)
+            score_parts.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+
+        if not id_parts:
+            return []
+        ids, inverse = np.unique(np.concatenate(id_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if mask is not None:
+            keep = np.zeros(len(ids), dtype=bool)
+            known = ids < len(mask)
+            keep[known] = mask[ids[known]]
+            ids, scores = ids[keep], scores[keep]
+        if len(ids) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            best = np.arange(len(ids))
+        best = best[np.argsort(-scores[best])]
+        return [(int(ids[i]), float(scores[i])) for i in best]
@@ -0,0 +1,95 @@
+### metadata_store.py
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+# File layout (little endian):
+#   header   : magic "QAMD", format version u32, id count u64, offset-table position u64
+#   records  : u32 byte length + compact UTF-8 JSON, one per chunk, in write order
+#   offsets  : u64 per FAISS id → absolute record position (0 = no chunk for this id)
+MAGIC = b"QAMD"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIQQ")
+LENGTH = struct.Struct("<I")
+
+
+class MetadataWriter:
+    """Streams chunk records to disk; the offset table is written on close()."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+        self._offsets = {}
+
+    def write(self, chunk_id: int, chunk: dict):
+        payload = json.dumps(chunk, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._offsets[chunk_id] = self._file.tell()
+        self._file.write(LENGTH.pack(len(payload)))
+        self._file.write(payload)
+
+    def close(self):
+        count = max(self._offsets, default=-1) + 1
+        table = np.zeros(count, dtype="<u8")
+        for chunk_id, offset in self._offsets.items():
+            table[chunk_id] = offset
+
+        table_pos = self._file.tell()
+        self._file.write(table.tobytes())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, table_pos))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self._tmp_path.unlink(missing_ok=True)
+
+
+class MetadataStore:
+    """
+    Read-only, memory-mapped view of a metadata file. Records are decoded lazily
+    by FAISS id, and the mapping is shared through the OS page cache across processes.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, table_pos = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"❌ Not a metadata store (or unsupported version): {self.path}")
+        self._offsets = np.frombuffer(self._mm, dtype="<u8", count=count, offset=table_pos)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def get(self, chunk_id: int) -> Optional[dict]:
+        if not 0 <= chunk_id < len(self._offsets):
+            return None
+        offset = int(self._offsets[chunk_id])
+        if offset == 0:
+            return None
+        (length,) = LENGTH.unpack_from(self._mm, offset)
+        start = offset + LENGTH.size
+        return json.loads(self._mm[start:start + length])
+
+    __getitem__ = get
+
+    def items(self) -> Iterator[Tuple[int, dict]]:
+        for chunk_id in np.flatnonzero(self._offsets):
+            yield int(chunk_id), self.get(int(chunk_id))
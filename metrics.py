@@ -0,0 +1,83 @@
+### metrics.py
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_histograms: Dict[str, "Histogram"] = {}
+
+
+class Histogram:
+    """Keeps count/sum plus a bounded window of recent samples for percentiles."""
+
+    def __init__(self, window: int = 2048):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": self.count}
+
+        def pct(p: float) -> float:
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "p99": pct(0.99),
+            "max": ordered[-1],
+        }
+
+
+def inc(name: str, value: float = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float):
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram()
+        _histograms[name].observe(value)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": {name: h.summary() for name, h in _histograms.items()},
+        }
+
+
+def start_reporter(interval: float = 60.0) -> threading.Thread:
+    """Log a metrics snapshot every `interval` seconds from a daemon thread."""
+
+    def _report():
+        while True:
+            time.sleep(interval)
+            logger.info(f"📊 Metrics: {snapshot()}")
+
+    thread = threading.Thread(target=_report, name="metrics-reporter", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,83 @@
+### query_batcher.py
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatcher:
+    """
+    Collects queries that arrive within `max_wait_ms` of each other (up to `max_batch`)
+    and answers them with one search_many() call, i.e. one model forward pass and one
+    FAISS search per batch. Callers get a Future per query.
+    """
+
+    def __init__(self, search_many: Callable[[List[str], int, Optional[str], tuple], List[list]],
+                 max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.search_many = search_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, top_k: int = 10, service: str = None, filters: tuple = ()) -> Future:
+        future = Future()
+        self._queue.put((query, (top_k, service, filters), future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Callers may have cancelled meanwhile (e.g. a cancelled handler task awaiting
+        # asyncio.wrap_future); a running Future can no longer be cancelled, so setting
+        # its result below can't fail
+        return [item for item in batch if item[2].set_running_or_notify_cancel()]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._answer(batch)
+            except Exception as e:
+                # Never let one bad batch stop the thread: every later search would hang
+                logger.exception(f"❌ Query batch failed: {e}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _answer(self, batch: list):
+        if not batch:
+            return
+        metrics.observe("search.batch_size", len(batch))
+
+        # Different top_k values, service shards or filters can't share one FAISS call
+        by_scope = {}
+        for item in batch:
+            by_scope.setdefault(item[1], []).append(item)
+
+        for (top_k, service, filters), items in by_scope.items():
+            try:
+                results = self.search_many([query for query, *_ in items], top_k, service, filters)
+            except Exception as e:
+                for _, _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            now = time.perf_counter()
+            for (_, _, future, queued_at), result in zip(items, results):
+                metrics.observe("search.latency_s", now - queued_at)
+                future.set_result(result)
@@ -0,0 +1,20 @@
+### rate_limiter.py
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe pacer: successive acquire() calls return at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,90 @@
+### reranker.py
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import metrics
+from config.config_loader import load_config_yaml
+
+logger = logging.getLogger(__name__)
+
+config = load_config_yaml()
+rerank_config = config.get("search", {}).get("rerank", {})
+RERANK_ENABLED = bool(rerank_config.get("enabled", False))
+RERANK_MODEL = rerank_config.get("model", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(rerank_config.get("candidates", 50))
+RERANK_BATCH_SIZE = int(rerank_config.get("batch_size", 16))
+RERANK_BUDGET_MS = float(rerank_config.get("budget_ms", 150))
+RERANK_MAX_LENGTH = int(rerank_config.get("max_length", 256))
+
+
+class Reranker:
+    """
+    Second-stage cross-encoder scoring on CPU. Candidates are scored in batches
+    until the per-query time budget would be exceeded; whatever is left keeps its
+    first-stage (FAISS) order behind the scored candidates.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, batch_size: int = RERANK_BATCH_SIZE,
+                 budget_ms: float = RERANK_BUDGET_MS):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget = budget_ms / 1000
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                logger.info(f"🧠 Loading rerank model: {self.model_name}")
+                self._model = CrossEncoder(self.model_name, max_length=RERANK_MAX_LENGTH, device="cpu")
+            return self._model
+
+    def warm_up(self):
+        self._get_model().predict([("warm up", "warm up")])
+
+    def rerank(self, query: str, texts: List[str]) -> List[Tuple[int, Optional[float]]]:
+        """
+        Order candidate texts (given best-first) by cross-encoder relevance.
+        Returns (position in texts, rerank_score), with rerank_score None for unscored candidates.
+        """
+        if not texts:
+            return []
+        model = self._get_model()
+
+        started = time.perf_counter()
+        scores: List[Optional[float]] = [None] * len(texts)
+        last_batch = 0.0
+        for start in range(0, len(texts), self.batch_size):
+            elapsed = time.perf_counter() - started
+            # Stop if the next batch (assumed as slow as the last one) would blow the budget
+            if elapsed + last_batch > self.budget:
+                metrics.inc("search.rerank_budget_exhausted")
+                logger.debug(f"⏳ Rerank budget spent after {start}/{len(texts)} candidates")
+                break
+            batch_started = time.perf_counter()
+            pairs = [(query, text) for text in texts[start:start + self.batch_size]]
+            for offset, score in enumerate(model.predict(pairs, batch_size=self.batch_size)):
+                scores[start + offset] = float(score)
+            last_batch = time.perf_counter() - batch_started
+
+        metrics.observe("search.rerank_s", time.perf_counter() - started)
+
+        scored = sorted(
+            (i for i, s in enumerate(scores) if s is not None),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        unscored = [i for i, s in enumerate(scores) if s is None]
+        return [(i, scores[i]) for i in scored + unscored]
+
+
+_reranker = None
+
+def get_reranker() -> Reranker:
+    global _reranker
+    if _reranker is None:
+        _reranker = Reranker()
+    return _reranker
@@ -1,101 +1,464 @@
 ### search.py
-import json
 import logging
-import re
 import ast
-from pathlib import Path
-from typing import List, Tuple, Dict
+import threading
+import time
+from typing import List, Tuple, Dict, NamedTuple, Optional
 
 import faiss
-from embedder import get_embedder
+import numpy as np
+import index_files
+from concurrent.futures import Future
+from embedder import get_embedder, embed_queries
+from query_batcher import QueryBatcher
+from semantic_cache import SemanticCache
+from reranker import RERANK_CANDIDATES, RERANK_ENABLED, get_reranker
+from faiss_index import apply_search_params, enable_reconstruct, filtered_search, prepare_vectors, to_distances
+from lexical_index import LexicalIndex
+from group_index import Filters, GroupIndex, normalize_filters
+from metadata_store import MetadataStore
 from config.config_loader import load_config_yaml
-from collections import defaultdict
+import metrics
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 config = load_config_yaml()
 search_config = config.get("search", {})
-DISTANCE_THRESHOLD = float(search_config.get("distance_threshold", 1.0))
+# With index.metric: cosine, thresholds can be given as cosine similarity (model-independent)
+# instead of raw distances; scores stay lower-is-better as cosine distance = 1 - similarity
+if search_config.get("min_similarity") is not None:
+    DISTANCE_THRESHOLD = 1 - float(search_config["min_similarity"])
+else:
+    DISTANCE_THRESHOLD = float(search_config.get("distance_threshold", 1.0))
+# Queries arriving within BATCH_MAX_WAIT_MS of each other share one encode + FAISS call
+BATCH_MAX_SIZE = int(search_config.get("batch_max_size", 32))
+BATCH_MAX_WAIT_MS = float(search_config.get("batch_max_wait_ms", 5))
+hybrid_config = search_config.get("hybrid", {})
+HYBRID_ENABLED = bool(hybrid_config.get("enabled", True))
+LEXICAL_K = int(hybrid_config.get("lexical_k", 20))
+RRF_K = int(hybrid_config.get("rrf_k", 60))
+# BM25-only hits are kept only within this distance of the query, so a single shared word
+# can't turn an unanswerable question into an answer; loosen it to favour exact-term matches
+if hybrid_config.get("lexical_min_similarity") is not None:
+    LEXICAL_DISTANCE_THRESHOLD = 1 - float(hybrid_config["lexical_min_similarity"])
+else:
+    LEXICAL_DISTANCE_THRESHOLD = float(hybrid_config.get("lexical_distance_threshold", DISTANCE_THRESHOLD))
+# Near-duplicate questions (same index version, same exact terms) are answered from recent results
+semantic_cache_config = search_config.get("semantic_cache", {})
+SEMANTIC_CACHE_ENABLED = bool(semantic_cache_config.get("enabled", True))
+SEMANTIC_CACHE_SIZE = int(semantic_cache_config.get("size", 512))
+SEMANTIC_CACHE_TTL = float(semantic_cache_config.get("ttl", 3600))
+SEMANTIC_CACHE_MAX_DISTANCE = float(semantic_cache_config.get("max_distance", 0.05))
 index_config = config.get("index", {})
-INDEX_DIR = Path(index_config.get("dir", "index"))
-INDEX_FILE = INDEX_DIR / index_config.get("name", "qa_index.faiss")
-META_FILE = INDEX_DIR / index_config.get("metadata", "qa_metadata.json")
-
-if not INDEX_FILE.exists() or not META_FILE.exists():
-    raise FileNotFoundError("❌ FAISS index or metadata file not found. Please run the indexer first.")
-
-logger.info("📦 Loading FAISS index and metadata...")
-index = faiss.read_index(str(INDEX_FILE))
-with open(META_FILE, "r", encoding="utf-8") as f:
-    metadata = json.load(f)
-
-embedder = get_embedder()
-
-def search(query: str, top_k: int = 10) -> List[dict]:
-    logger.info(f"🔍 Searching for: {query}")
-    embedding = embedder.encode([query])
-    D, I = index.search(embedding, top_k)
-
-    raw_results = []
-    for i, idx in enumerate(I[0]):
-        if idx < len(metadata):
-            distance = float(D[0][i])
-            if distance <= DISTANCE_THRESHOLD:
-                raw_results.append((distance, metadata[idx]))
-
-    if not raw_results:
-        logger.warning("🚫 No matching results found under threshold.")
-        return []
-
-    # Group by origin + source
-    grouped = {}
-    for distance, chunk in raw_results:
-        key = (chunk["origin"], chunk["source"])
-        if key not in grouped:
-            grouped[key] = {
-                "source": chunk["source"],
-                "origin": chunk["origin"],
-                "score": distance,
-                "chunks": [chunk]
-            }
+RELOAD_INTERVAL = float(index_config.get("reload_interval", 30))
+
+
+class IndexSnapshot(NamedTuple):
+    """One immutable, fully loaded index version. Queries grab a single reference to it."""
+    version: str
+    index: faiss.Index
+    metadata: MetadataStore
+    lexical: Optional[LexicalIndex]
+    groups: GroupIndex
+    shards: Dict[str, faiss.Index]  # service -> index over that service's chunks only
+
+
+def load_snapshot(version: str) -> IndexSnapshot:
+    files = index_files.paths(version)
+    if not files["index"].exists() or not files["metadata"].exists():
+        raise FileNotFoundError(f"❌ Index version {version} is incomplete: {files['index'].parent}")
+
+    index = faiss.read_index(str(files["index"]))
+    apply_search_params(index, index_config)
+
+    lexical = None
+    if HYBRID_ENABLED and files["lexical"].exists():
+        lexical = LexicalIndex(files["lexical"])
+        enable_reconstruct(index)
+
+    metadata = MetadataStore(files["metadata"])
+    try:
+        groups = GroupIndex.load(files["groups"])
+    except (FileNotFoundError, KeyError):
+        logger.warning(f"⚠️ Version {version} has no (current) group index, rebuilding it from metadata")
+        groups = GroupIndex.from_metadata(metadata.items())
+
+    shards = {}
+    for service in groups.services:
+        shard_file = index_files.shard_path(version, service)
+        if shard_file.exists():
+            shards[service] = faiss.read_index(str(shard_file))
+            apply_search_params(shards[service], index_config)
+    return IndexSnapshot(version, index, metadata, lexical, groups, shards)
+
+
+class SearchEngine:
+    """
+    FAISS index + metadata + embedding model, loaded on first use or by an
+    explicit warm_up(). `ready` tells callers whether a query will be served
+    without paying the load cost.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._reload_requested = threading.Event()
+        self._watcher = None
+        self._answers = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_MAX_DISTANCE) \
+            if SEMANTIC_CACHE_ENABLED else None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def version(self) -> Optional[str]:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def warm_up(self, background: bool = False):
+        """Load everything now; with background=True, do it on a daemon thread and return the thread."""
+        if not background:
+            self._load()
+            return None
+
+        def _warm():
+            try:
+                self._load()
+            except Exception:
+                logger.exception("❌ Search engine warm-up failed")
+
+        thread = threading.Thread(target=_warm, name="search-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _load(self):
+        if self._ready.is_set():
+            return
+        with self._load_lock:
+            if self._ready.is_set():
+                return  # loaded by a concurrent caller
+            version = index_files.current_version()
+            if version is None:
+                raise FileNotFoundError("❌ FAISS index or metadata file not found. Please run the indexer first.")
+
+            started = time.perf_counter()
+            logger.info(f"📦 Loading FAISS index and metadata (version {version})...")
+            self._snapshot = load_snapshot(version)
+
+            # Load the model and run one encode so the first real query doesn't pay for lazy init
+            get_embedder().encode(["warm up"])
+            if RERANK_ENABLED:
+                get_reranker().warm_up()
+
+            elapsed = time.perf_counter() - started
+            metrics.set_gauge("search.warmup_s", elapsed)
+            logger.info(f"✅ Search engine ready in {elapsed:.2f}s ({self._snapshot.index.ntotal} vectors)")
+            self._ready.set()
+
+    def reload(self) -> bool:
+        """
+        Load the version named in CURRENT, if it differs from the live one, and swap it in.
+        Loading happens on the calling thread; in-flight queries keep using the old snapshot.
+        """
+        version = index_files.current_version()
+        if version is None or version == self.version:
+            return False
+
+        with self._load_lock:
+            if version == self.version:
+                return False
+            started = time.perf_counter()
+            snapshot = load_snapshot(version)
+            # Touch the new index once so its pages are resident before real queries land on it
+            snapshot.index.search(np.zeros((1, snapshot.index.d), dtype=np.float32), 1)
+            previous, self._snapshot = self.version, snapshot
+            self._ready.set()
+
+        elapsed = time.perf_counter() - started
+        metrics.inc("search.reloads")
+        metrics.observe("search.reload_s", elapsed)
+        logger.info(f"🔄 Swapped index {previous} → {version} in {elapsed:.2f}s ({snapshot.index.ntotal} vectors)")
+        return True
+
+    def request_reload(self):
+        """Ask the watcher to check for a new version now (e.g. from a SIGHUP handler)."""
+        self._reload_requested.set()
+
+    def start_watcher(self, interval: float = RELOAD_INTERVAL) -> threading.Thread:
+        """Poll CURRENT every `interval` seconds (or on request_reload) and hot-swap new versions."""
+        if self._watcher is not None:
+            return self._watcher
+
+        def _watch():
+            while True:
+                self._reload_requested.wait(interval)
+                self._reload_requested.clear()
+                try:
+                    self.reload()
+                except Exception:
+                    logger.exception("❌ Index reload failed, keeping the current version")
+
+        self._watcher = threading.Thread(target=_watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def search(self, query: str, top_k: int = 10, service: str = None, filters: dict = None) -> List[dict]:
+        return self.search_many([query], top_k, service, normalize_filters(filters))[0]
+
+    def search_many(self, queries: List[str], top_k: int = 10, service: str = None,
+                    filters: Filters = ()) -> List[List[dict]]:
+        """
+        Answer several queries with one batched encode and one batched FAISS search.
+        With `service`, only that service's shard is searched (and only its chunks fused in).
+        `filters` (see group_index.normalize_filters) restrict hits to matching chunks inside
+        the FAISS and BM25 scans, so they don't crowd out the top_k after the fact.
+        """
+        self._load()
+        snapshot = self._snapshot
+        for query in queries:
+            logger.info(f"🔍 Searching for: {query}")
+        embeddings = embed_queries(queries)
+
+        results = [None] * len(queries)
+        if self._answers is not None:
+            # Near-identical embeddings can still differ in an identifier (an error code, a version)
+            # that BM25 ranks on, so those terms are part of the cache scope; plain words are not,
+            # so paraphrases still share an answer
+            scopes = [
+                (snapshot.version, top_k, service, filters,
+                 snapshot.lexical.identifier_terms(query) if snapshot.lexical is not None else None)
+                for query in queries
+            ]
+            for row in range(len(queries)):
+                results[row] = self._answers.get(embeddings[row], scopes[row])
+        pending = [row for row, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        # With reranking on, the cheap first stage fetches a wider candidate set
+        fetch_k = max(top_k, RERANK_CANDIDATES) if RERANK_ENABLED else top_k
+        index = snapshot.index
+        if service is not None:
+            index = snapshot.shards.get(service)
+            if index is None:
+                logger.warning(f"⚠️ No shard for service '{service}', searching all services")
+                index, service = snapshot.index, None
+        # The shard already holds only its service; lexical hits and group expansion still need it
+        if service is not None:
+            filters = normalize_filters({**dict(filters), "service": service})
+        mask = snapshot.groups.filter_mask(filters) if filters else None
+
+        metric = index.metric_type
+        query_vectors = prepare_vectors(embeddings[pending], metric)
+        if mask is not None:
+            D, I = filtered_search(index, query_vectors, fetch_k, mask)
         else:
-            grouped[key]["chunks"].append(chunk)
-            if distance < grouped[key]["score"]:
-                grouped[key]["score"] = distance  # keep best score
+            D, I = index.search(query_vectors, fetch_k)
+        D = to_distances(D, metric)
+
+        for i, row in enumerate(pending):
+            query = queries[row]
+            distances, ids = self._dense_hits(D[i], I[i])
+            if snapshot.lexical is not None:
+                lexical = snapshot.lexical.search(query, LEXICAL_K, mask)
+                distances, ids = self._fuse(snapshot, query_vectors[i], distances, ids, lexical)
+            rerank_scores = None
+            if RERANK_ENABLED:
+                distances, ids, rerank_scores = self._rerank(snapshot, query, distances, ids, top_k)
+            results[row] = self._group_hits(snapshot, distances, ids, rerank_scores, filters)
+            if self._answers is not None:
+                self._answers.put(embeddings[row], scopes[row], results[row])
+        return results
+
+    def _dense_hits(self, distances: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # FAISS pads with -1 when fewer than top_k hits exist
+        keep = (ids >= 0) & (distances <= DISTANCE_THRESHOLD)
+        return distances[keep], ids[keep]
+
+    def _fuse(self, snapshot: IndexSnapshot, query_vector: np.ndarray, distances: np.ndarray, ids: np.ndarray,
+              lexical: List[Tuple[int, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reciprocal rank fusion of the dense and BM25 rankings. Lexical-only hits get their true
+        vector distance and are dropped beyond LEXICAL_DISTANCE_THRESHOLD, so a query with no
+        relevant answer still comes back empty and the bot's confidence check keeps working.
+        """
+        lexical_ids = np.array([chunk_id for chunk_id, _ in lexical], dtype=np.int64)
+        all_ids = np.concatenate([ids.astype(np.int64), lexical_ids])
+        ranks = np.concatenate([np.arange(len(ids)), np.arange(len(lexical_ids))])
+        fused_ids, inverse = np.unique(all_ids, return_inverse=True)
+        fused = np.bincount(inverse, weights=1 / (RRF_K + ranks + 1))
+        # Ties keep the order hits were first seen in (dense before lexical)
+        first_seen = np.full(len(fused_ids), len(all_ids))
+        np.minimum.at(first_seen, inverse, np.arange(len(all_ids)))
+
+        fused_distances = np.full(len(fused_ids), np.nan, dtype=np.float32)
+        fused_distances[inverse[:len(ids)]] = distances
+        lexical_only = np.flatnonzero(np.isnan(fused_distances))
+        if len(lexical_only):
+            try:
+                vectors = snapshot.index.reconstruct_batch(fused_ids[lexical_only])
+                if snapshot.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                    scores = vectors @ query_vector
+                else:
+                    scores = ((vectors - query_vector) ** 2).sum(axis=1)
+                fused_distances[lexical_only] = to_distances(scores, snapshot.index.metric_type)
+            except RuntimeError:
+                logger.warning("⚠️ Index can't reconstruct vectors, dropping lexical-only hits")
+                fused_distances[lexical_only] = np.inf
+            far = lexical_only[fused_distances[lexical_only] > LEXICAL_DISTANCE_THRESHOLD]
+            keep = np.ones(len(fused_ids), dtype=bool)
+            keep[far] = False
+            fused_ids, fused, first_seen, fused_distances = (
+                fused_ids[keep], fused[keep], first_seen[keep], fused_distances[keep])
+
+        order = np.lexsort((first_seen, -fused))
+        return fused_distances[order], fused_ids[order]
+
+    def _rerank(self, snapshot: IndexSnapshot, query: str, distances: np.ndarray, ids: np.ndarray,
+                top_k: int) -> Tuple[np.ndarray, np.ndarray, List[Optional[float]]]:
+        chunks = [snapshot.metadata.get(int(chunk_id)) for chunk_id in ids]
+        present = np.array([chunk is not None for chunk in chunks], dtype=bool)
+        texts = [chunk["text"] for chunk in chunks if chunk is not None]
+        distances, ids = distances[present], ids[present]
+
+        ranked = get_reranker().rerank(query, texts)[:top_k]
+        order = np.array([i for i, _ in ranked], dtype=np.int64)
+        return distances[order], ids[order], [score for _, score in ranked]
+
+    def _group_hits(self, snapshot: IndexSnapshot, distances: np.ndarray, ids: np.ndarray,
+                    rerank_scores: Optional[List[Optional[float]]] = None, filters: Filters = ()) -> List[dict]:
+        """
+        Group ranked hits by origin + source using the precomputed group ids. Hits arrive
+        best-first (by distance, or by rerank score), so groups are ordered by their first hit
+        and scored by their best (lowest) distance. Video groups come back complete (summary,
+        steps and FAQ), sheet groups with just the rows that matched.
+        """
+        groups = snapshot.groups
+        group_ids = np.full(len(ids), -1, dtype=np.int64)
+        known = ids < len(groups.group_of)
+        group_ids[known] = groups.group_of[ids[known]]
+        keep = group_ids >= 0
+        distances, ids, group_ids = distances[keep], ids[keep], group_ids[keep]
+        if rerank_scores is not None:
+            rerank_scores = [score for score, kept in zip(rerank_scores, keep) if kept]
 
-    sorted_groups = sorted(grouped.values(), key=lambda x: x["score"])
-    return sorted_groups
+        if not len(ids):
+            logger.warning("🚫 No matching results found under threshold.")
+            return []
 
-def format_result(group: dict) -> str:
+        unique, inverse = np.unique(group_ids, return_inverse=True)
+        best = np.full(len(unique), np.inf, dtype=np.float32)
+        np.minimum.at(best, inverse, distances)
+        first_hit = np.full(len(unique), len(ids))
+        np.minimum.at(first_hit, inverse, np.arange(len(ids)))
+
+        results = []
+        for g in np.argsort(first_hit):
+            group_id = int(unique[g])
+            if groups.expand[group_id]:
+                member_ids = groups.member_ids(group_id)
+                if filters:
+                    member_ids = member_ids[groups.matches(member_ids, filters)]
+            else:
+                member_ids = ids[inverse == g]
+            chunks = [(int(chunk_id), snapshot.metadata.get(int(chunk_id))) for chunk_id in member_ids]
+            chunks = [(chunk_id, chunk) for chunk_id, chunk in chunks if chunk is not None]
+            group = {
+                "version": snapshot.version,
+                "group_id": group_id,
+                "source": groups.sources[group_id],
+                "origin": groups.origins[group_id],
+                "score": float(best[g]),
+                "chunk_ids": [chunk_id for chunk_id, _ in chunks],
+                "chunks": [chunk for _, chunk in chunks],
+            }
+            if rerank_scores is not None and rerank_scores[first_hit[g]] is not None:
+                group["rerank_score"] = rerank_scores[first_hit[g]]
+            results.append(group)
+        return results
+
+
+_engine = None
+_engine_lock = threading.RLock()
+
+def get_engine() -> SearchEngine:
+    """Process-wide engine; constructing it is cheap, loading happens on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SearchEngine()
+        return _engine
+
+_batcher = None
+
+def get_batcher() -> QueryBatcher:
+    global _batcher
+    with _engine_lock:
+        if _batcher is None:
+            _batcher = QueryBatcher(get_engine().search_many, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+        return _batcher
+
+def submit_search(query: str, top_k: int = 10, service: str = None, filters: dict = None) -> Future:
+    """
+    Queue a query for the next micro-batch; the Future resolves to the ranked groups.
+    `filters` maps chunk fields (source, type, service, origin) to a value or list of values.
+    """
+    return get_batcher().submit(query, top_k, service, normalize_filters(filters))
+
+def search(query: str, top_k: int = 10, service: str = None, filters: dict = None) -> List[dict]:
+    return submit_search(query, top_k, service, filters).result()
+
+def parse_step_lines(text: str) -> List[str]:
+    """Recover step labels from a steps chunk's text (metadata written before chunks carried `steps`)."""
+    steps = []
+    for line in text.split("\n"):
+        line = line.strip("- ").strip()
+        try:
+            parsed = ast.literal_eval(line)
+            step_text = parsed.get("step", line)
+        except (SyntaxError, ValueError, AttributeError):
+            step_text = line  # fallback if parsing fails
+        steps.append(step_text)
+    return steps
+
+def render_group(group: dict) -> Tuple[str, str]:
+    """
+    The query-independent parts of an answer: the header above the score line and
+    everything below it. Only depends on the group's chunks, so callers may cache it.
+    """
     title = group["chunks"][0].get("title", group["origin"])
     service = group["chunks"][0].get("service", "unknown")
     url = group["chunks"][0].get("url")
-    top_score = group["score"]
 
-    display = f"\n📌 Source: {group['source'].upper()} ({service})\n🎬 Title: {title}\n🧠 Top Score: {top_score:.4f}"
+    head = f"\n📌 Source: {group['source'].upper()} ({service})\n🎬 Title: {title}"
+    body = ""
     if url:
-        display += f"\n🔗 Watch video: {url}"
+        body += f"\n🔗 Watch video: {url}"
 
     for chunk in group["chunks"]:
         if chunk["type"] == "summary":
-            display += f"\n\n📝 Summary:\n{chunk['text']}"
+            body += f"\n\n📝 Summary:\n{chunk['text']}"
         elif chunk["type"] == "steps":
-            lines = chunk["text"].split("\n")
-            formatted_steps = []
-            for i, line in enumerate(lines, 1):
-                line = line.strip("- ").strip()
-                try:
-                    parsed = ast.literal_eval(line)
-                    step_text = parsed.get("step", line)
-                except (SyntaxError, ValueError):
-                    step_text = line  # fallback if parsing fails
-                formatted_steps.append(f"{i}. {step_text}")
-            display += f"\n\n🪜 Steps:\n" + "\n".join(formatted_steps)
+            steps = chunk.get("steps") or parse_step_lines(chunk["text"])
+            body += f"\n\n🪜 Steps:\n" + "\n".join(f"{i}. {step}" for i, step in enumerate(steps, 1))
         elif chunk["type"] == "faq":
-            display += f"\n\n❓ Q&A:\n{chunk['text']}"
+            body += f"\n\n❓ Q&A:\n{chunk['text']}"
+
+    return head, body
+
+def answer_key(group: dict) -> tuple:
+    """Identifies a rendered answer: same index version, same group, same chunks shown."""
+    return group["version"], group["group_id"], tuple(group["chunk_ids"])
 
-    return display
+def format_result(group: dict, rendered: Tuple[str, str] = None) -> str:
+    head, body = rendered or render_group(group)
+    return f"{head}\n🧠 Top Score: {group['score']:.4f}{body}"
 
 if __name__ == "__main__":
     import sys
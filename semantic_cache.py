@@ -0,0 +1,72 @@
+### semantic_cache.py
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+import metrics
+
+
+class SemanticCache:
+    """
+    Ranked results of recent queries, looked up by embedding rather than by text: a query
+    within `max_distance` (squared L2 between raw query embeddings) of a cached one,
+    with the same scope (index version, top_k, filters and the query's identifier-like
+    terms, such as error codes), gets the cached results.
+    Fixed-size, LRU with a TTL.
+    Cached values are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, size: int = 512, ttl: float = 3600.0, max_distance: float = 0.05):
+        self.size = size
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self._vectors = None  # (size, dim), allocated on first put
+        self._expires = np.zeros(size, dtype=np.float64)  # 0 marks an empty slot
+        self._last_used = np.zeros(size, dtype=np.float64)
+        self._scopes = [None] * size
+        self._values = [None] * size
+        self._lock = threading.Lock()
+
+    def _live(self, scope: Hashable, now: float) -> np.ndarray:
+        return (self._expires > now) & np.array([s == scope for s in self._scopes], dtype=bool)
+
+    def get(self, vector: np.ndarray, scope: Hashable) -> Optional[Any]:
+        with self._lock:
+            now = time.monotonic()
+            if self._vectors is None or not (live := self._live(scope, now)).any():
+                metrics.inc("search.semantic_cache_misses")
+                return None
+            slots = np.flatnonzero(live)
+            distances = ((self._vectors[slots] - vector) ** 2).sum(axis=1)
+            best = int(np.argmin(distances))
+            if distances[best] > self.max_distance:
+                metrics.inc("search.semantic_cache_misses")
+                return None
+            slot = slots[best]
+            self._last_used[slot] = now
+            metrics.inc("search.semantic_cache_hits")
+            return self._values[slot]
+
+    def put(self, vector: np.ndarray, scope: Hashable, value: Any):
+        with self._lock:
+            now = time.monotonic()
+            if self._vectors is None:
+                self._vectors = np.zeros((self.size, len(vector)), dtype=np.float32)
+            # Empty and expired slots first (their last_used is oldest or irrelevant), then LRU
+            slot = int(np.argmin(np.where(self._expires > now, self._last_used, -1)))
+            self._vectors[slot] = vector
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+            self._scopes[slot] = scope
+            self._values[slot] = value
+
+    def clear(self):
+        with self._lock:
+            self._expires[:] = 0
+            self._scopes = [None] * self.size
+            self._values = [None] * self.size
+
+    def __len__(self):
+        return int((self._expires > time.monotonic()).sum())
@@ -0,0 +1,39 @@
+import logging
+import time
+from typing import List
+
+import metrics
+from config.config_loader import load_config_yaml
+from sheets.sheet_client import with_worksheet
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+config = load_config_yaml()
+batch_cfg = config.get("sheets_batch", {})
+# Outbox jobs of one kind (staging rows, new users) are written MAX_ROWS per append_rows call,
+# or fewer once the oldest has waited MAX_DELAY seconds
+MAX_ROWS = int(batch_cfg.get("max_rows", 50))
+MAX_DELAY = float(batch_cfg.get("max_delay", 5.0))
+
+
+def append_rows(sheet_url: str, sheet_tab: str, rows: List[list]):
+    """
+    Write rows with a single append_rows call. Called from batched outbox handlers:
+    raises on failure so the outbox retries (and eventually dead-letters) every job
+    in the batch, and the jobs are only acked once their rows are in the sheet.
+    """
+    if not rows:
+        return
+    started = time.perf_counter()
+    try:
+        with_worksheet(sheet_url, sheet_tab, lambda sheet: sheet.append_rows(rows))
+    except Exception:
+        metrics.inc("sheets.flush_failures")
+        raise
+
+    elapsed = time.perf_counter() - started
+    metrics.observe("sheets.flush_latency_s", elapsed)
+    metrics.observe("sheets.flush_batch_size", len(rows))
+    metrics.inc("sheets.rows_flushed", len(rows))
+    logger.info(f"📤 Flushed {len(rows)} rows to '{sheet_tab}' in {elapsed:.2f}s")
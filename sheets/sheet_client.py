@@ -1,12 +1,75 @@
 import gspread
 from google.oauth2.service_account import Credentials
+import logging
 import os
+import threading
+
+logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
-def get_sheet_client():
+# Status codes that mean our token/session is no longer accepted
+AUTH_ERROR_CODES = {401, 403}
+
+# === PROCESS-WIDE CLIENT AND WORKSHEET POOL ===
+_lock = threading.Lock()
+_client = None
+_worksheets = {}  # (url, tab) -> gspread.Worksheet
+
+
+def _authorize():
     creds_file = os.getenv("GOOGLE_CREDS_FILE")
     if not creds_file:
         raise ValueError("GOOGLE_CREDS_FILE not set in .env")
     creds = Credentials.from_service_account_file(creds_file, scopes=SCOPES)
-    return gspread.authorize(creds)
\ No newline at end of file
+    # gspread wraps creds in an AuthorizedSession, which refreshes the access token on expiry
+    return gspread.authorize(creds)
+
+
+def get_sheet_client():
+    global _client
+    with _lock:
+        if _client is None:
+            _client = _authorize()
+            logger.info("🔐 Authorized Google Sheets client")
+        return _client
+
+
+def get_worksheet(sheet_url: str, sheet_tab: str):
+    """Return a cached worksheet handle; opening one costs several API round-trips."""
+    key = (sheet_url, sheet_tab)
+    worksheet = _worksheets.get(key)
+    if worksheet is None:
+        worksheet = get_sheet_client().open_by_url(sheet_url).worksheet(sheet_tab)
+        with _lock:
+            worksheet = _worksheets.setdefault(key, worksheet)
+    return worksheet
+
+
+def invalidate(reset_client: bool = False):
+    """Drop cached worksheet handles, and optionally force re-authorization."""
+    global _client
+    with _lock:
+        _worksheets.clear()
+        if reset_client:
+            _client = None
+
+
+def _status_code(e: Exception):
+    return getattr(getattr(e, "response", None), "status_code", None)
+
+
+def with_worksheet(sheet_url: str, sheet_tab: str, action):
+    """
+    Run action(worksheet) against a pooled handle. On an auth error, or a 404 from a
+    stale handle, the pool is invalidated and the call retried once.
+    """
+    try:
+        return action(get_worksheet(sheet_url, sheet_tab))
+    except gspread.exceptions.APIError as e:
+        status = _status_code(e)
+        if status not in AUTH_ERROR_CODES and status != 404:
+            raise
+        logger.warning(f"♻️ Sheets call failed with HTTP {status}, refreshing pooled handles")
+        invalidate(reset_client=status in AUTH_ERROR_CODES)
+        return action(get_worksheet(sheet_url, sheet_tab))
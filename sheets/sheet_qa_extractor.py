@@ -1,15 +1,23 @@
 import logging
-from typing import List, Dict
-from sheets.sheet_client import get_sheet_client
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+from sheets.sheet_client import with_worksheet
 from config.config_loader import load_config_yaml
+from rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+extraction_cfg = load_config_yaml().get("index", {}).get("extraction", {})
+SHEET_WORKERS = int(extraction_cfg.get("sheet_workers", 4))
+# Sheets API read quotas are per minute; space fetches out rather than tripping 429s
+SHEET_FETCHES_PER_SECOND = float(extraction_cfg.get("sheet_fetches_per_second", 1.0))
+
+_limiter = RateLimiter(SHEET_FETCHES_PER_SECOND)
+
 
 def extract_chunks_from_sheet(sheet_url: str, sheet_tab: str, service: str = "general") -> List[Dict]:
-    gc = get_sheet_client()
-    sheet = gc.open_by_url(sheet_url).worksheet(sheet_tab)
-    records = sheet.get_all_records()
+    _limiter.acquire()
+    records = with_worksheet(sheet_url, sheet_tab, lambda sheet: sheet.get_all_records())
     chunks = []
 
     for row in records:
@@ -28,19 +36,34 @@ def extract_chunks_from_sheet(sheet_url: str, sheet_tab: str, service: str = "ge
     return chunks
 
 
-def extract_all_sheet_chunks() -> List[Dict]:
+def configured_sheets() -> List[Tuple[str, str, str]]:
+    """(service, url, tab) for every sheet listed under data_sources.google_sheets."""
     config = load_config_yaml()
     sheets_cfg = config.get("data_sources", {}).get("google_sheets", {})
-    chunks = []
+    return [
+        (name, entry.get("url"), entry.get("tab"))
+        for name, entry in sheets_cfg.items()
+        if entry.get("url") and entry.get("tab")
+    ]
 
-    for name, entry in sheets_cfg.items():
-        url = entry.get("url")
-        tab = entry.get("tab")
-        if not url or not tab:
-            continue
-        chunks.extend(extract_chunks_from_sheet(url, tab, service=name))
 
-    return chunks
+def iter_sheet_chunks(workers: int = SHEET_WORKERS) -> Iterator[List[Dict]]:
+    """Fetch all sheets on a bounded pool, yielding each sheet's chunks as soon as it arrives."""
+    sheets = configured_sheets()
+    if not sheets:
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheets") as pool:
+        futures = [pool.submit(extract_chunks_from_sheet, url, tab, name) for name, url, tab in sheets]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def extract_all_sheet_chunks() -> List[Dict]:
+    return [chunk for chunks in iter_sheet_chunks() for chunk in chunks]
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sheets.sheet_client import get_sheet_client
+from sheets.batch_writer import append_rows
 from datetime import datetime
 import logging
 
@@ -15,9 +15,12 @@ SHEET_TAB = staging_cfg.get("tab", "staging_qa")
 
 # === LOGGING FUNCTION ===
 def log_staging_qa(question: str, answer: str = None, user: str = None, chat: str = None):
-    gc = get_sheet_client()
-    sheet = gc.open_by_url(SHEET_URL).worksheet(SHEET_TAB)
+    log_staging_qa_batch([{"question": question, "answer": answer, "user": user, "chat": chat}])
 
+def log_staging_qa_batch(entries: list):
+    """Stage several Q&A rows (dicts with log_staging_qa's arguments) in one append_rows call."""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    sheet.append_row([now, chat, user, question, answer or "", "", ""])
-    logger.info(f"📝 Staged new Q&A: {question} → {answer}")
\ No newline at end of file
+    rows = [[now, e.get("chat"), e.get("user"), e["question"], e.get("answer") or "", "", ""] for e in entries]
+    append_rows(SHEET_URL, SHEET_TAB, rows)
+    for e in entries:
+        logger.info(f"📝 Staged new Q&A: {e['question']} → {e.get('answer')}")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sheets.sheet_client import get_sheet_client
+from sheets.sheet_client import get_worksheet, with_worksheet
 import logging
 
 logger = logging.getLogger(__name__)
@@ -6,11 +6,12 @@ logger = logging.getLogger(__name__)
 def increment_feedback(sheet_url: str, worksheet_name: str, matched_question: str, feedback_type: str):
     assert feedback_type in ["positive_feedback", "negative_feedback"], "Invalid feedback type"
 
-    gc = get_sheet_client()
-    sheet = gc.open_by_url(sheet_url).worksheet(worksheet_name)
+    values = with_worksheet(sheet_url, worksheet_name, lambda sheet: sheet.get_all_values())
+    sheet = get_worksheet(sheet_url, worksheet_name)
 
-    records = sheet.get_all_records()
-    headers = sheet.row_values(1)
+    # One read instead of get_all_records() + row_values(1)
+    headers = values[0] if values else []
+    records = [dict(zip(headers, row)) for row in values[1:]]
 
     try:
         feedback_col_index = headers.index(feedback_type) + 1  # gspread is 1-based
@@ -1,5 +1,8 @@
 from datetime import datetime
-from sheets.sheet_client import get_sheet_client
+import threading
+import time
+from sheets.sheet_client import with_worksheet
+from sheets.batch_writer import append_rows
 from config.config_loader import load_config_yaml
 import logging
 
@@ -10,41 +13,118 @@ config = load_config_yaml()
 user_cfg = config.get("data_sources", {}).get("google_sheets", {}).get("users", {})
 USER_SHEET_URL = user_cfg.get("url")
 USER_SHEET_TAB = user_cfg.get("tab", "users")
+USER_CACHE_TTL = float(user_cfg.get("cache_ttl", 300))
 
 if not USER_SHEET_URL:
     raise ValueError("❌ USER_SHEET_URL not found in config.yaml")
 
+# === USER DIRECTORY CACHE ===
+class UserDirectory:
+    """
+    In-memory copy of the users sheet, indexed by user_id and username.
+    Reloaded from the sheet at most once per TTL; new users are written through.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL):
+        self.ttl = ttl
+        self._by_id = {}
+        self._by_username = {}
+        self._loaded_at = None
+        self._refresh_lock = threading.Lock()
+
+    def _load(self):
+        records = with_worksheet(USER_SHEET_URL, USER_SHEET_TAB, lambda sheet: sheet.get_all_records())
+        by_id, by_username = {}, {}
+        for row in records:
+            user_id = str(row.get("user_id", "")).strip()
+            username = str(row.get("username", "")).strip()
+            if user_id:
+                by_id[user_id] = row
+            if username:
+                by_username[username] = row
+        # Swap whole dicts so readers never see a half-built directory
+        self._by_id, self._by_username = by_id, by_username
+        self._loaded_at = time.monotonic()
+        logger.info(f"👥 Loaded {len(by_id)} users into directory cache")
+
+    def _ensure_fresh(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        with self._refresh_lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return  # another thread refreshed while we waited
+            try:
+                self._load()
+            except Exception:
+                if self._loaded_at is None:
+                    raise
+                logger.exception("⚠️ User directory refresh failed, serving stale entries")
+                self._loaded_at = time.monotonic()
+
+    def get_by_id(self, user_id) -> dict:
+        self._ensure_fresh()
+        return self._by_id.get(str(user_id).strip())
+
+    def get_by_username(self, username: str) -> dict:
+        self._ensure_fresh()
+        return self._by_username.get(username)
+
+    def remember(self, row: dict):
+        """Write-through hook: make a freshly appended user visible without a reload."""
+        if row.get("user_id"):
+            self._by_id[str(row["user_id"])] = row
+        if row.get("username"):
+            self._by_username[row["username"]] = row
+
+
+directory = UserDirectory()
+
+
+def _row_email(row: dict) -> str:
+    if not row:
+        return None
+    email = str(row.get("email") or row.get("Email") or "").strip()
+    return email or None
+
 # === USER TRACKING ===
 def log_user_if_new(user):
     """
     Append Telegram user metadata to sheet if not already present.
     """
+    log_users_if_new([user])
+
+def log_users_if_new(users: list):
+    """
+    Append every user not yet in the sheet with a single append_rows call.
+    """
     try:
-        sheet = get_sheet_client().open_by_url(USER_SHEET_URL).worksheet(USER_SHEET_TAB)
-        existing_ids = sheet.col_values(1)
-        if str(user.id) in existing_ids:
-            return
-        sheet.append_row([
-            str(user.id),
-            user.username or "",
-            user.first_name or "",
-            user.last_name or "",
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            ""  # Email (to be filled manually)
-        ])
-        logger.info(f"✅ Logged new user: {user.id} ({user.username})")
+        rows, seen = [], set()
+        for user in users:
+            if str(user.id) in seen or directory.get_by_id(user.id):
+                continue
+            seen.add(str(user.id))
+            rows.append([
+                str(user.id),
+                user.username or "",
+                user.first_name or "",
+                user.last_name or "",
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ""  # Email (to be filled manually)
+            ])
+        append_rows(USER_SHEET_URL, USER_SHEET_TAB, rows)
+        for row in rows:
+            directory.remember({"user_id": row[0], "username": row[1], "email": ""})
+            logger.info(f"✅ Logged new user: {row[0]} ({row[1]})")
     except Exception as e:
-        logger.error(f"❌ Failed to log user: {e}")
+        logger.error(f"❌ Failed to log users: {e}")
+        raise
 
 def get_email_by_user_id(user_id: str) -> str:
     """
     Lookup email using Telegram user ID.
     """
     try:
-        sheet = get_sheet_client().open_by_url(USER_SHEET_URL).worksheet(USER_SHEET_TAB)
-        for row in sheet.get_all_records():
-            if str(row.get("user_id")).strip() == str(user_id).strip():
-                return row.get("email", "").strip()
+        return _row_email(directory.get_by_id(user_id))
     except Exception as e:
         logger.error(f"❌ Failed to get email by user ID {user_id}: {e}")
     return None
@@ -54,10 +134,7 @@ def get_email_by_username(username: str) -> str:
     Lookup email using Telegram username.
     """
     try:
-        sheet = get_sheet_client().open_by_url(USER_SHEET_URL).worksheet(USER_SHEET_TAB)
-        for row in sheet.get_all_records():
-            if row.get("username") == username and row.get("Email"):
-                return row["Email"]
+        return _row_email(directory.get_by_username(username))
     except Exception as e:
         logger.error(f"❌ Failed to retrieve email for username {username}: {e}")
-    return None
\ No newline at end of file
+    return None
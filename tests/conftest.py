@@ -0,0 +1,42 @@
+### tests/conftest.py
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Modules read config.yaml at import time; give them a throwaway config instead of the deployment one
+import config.config_loader as config_loader  # noqa: E402
+
+SCRATCH = Path(tempfile.mkdtemp(prefix="qa-bot-tests-"))
+config_loader._config_cache = {
+    "index": {"dir": str(SCRATCH / "index")},
+    "embedding": {"cache_dir": str(SCRATCH / "embedding_cache")},
+    "outbox": {"path": str(SCRATCH / "outbox.sqlite3")},
+    "data_sources": {"google_sheets": {"users": {"url": "https://sheets.invalid/users"}}},
+}
+
+
+class BagOfWordsModel:
+    """Deterministic offline embeddings: texts sharing words are close, unrelated texts are not."""
+
+    def __init__(self, dim: int = 64, buckets: int = 4096):
+        self.table = np.random.default_rng(0).standard_normal((buckets, dim)).astype(np.float32)
+
+    def encode(self, texts, **kwargs):
+        from lexical_index import tokenize
+        vectors = np.stack([
+            self.table[[zlib.crc32(t.encode()) % len(self.table) for t in tokenize(text) or [""]]].sum(axis=0)
+            for text in texts
+        ])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture(scope="session")
+def stub_model():
+    return BagOfWordsModel()
@@ -0,0 +1,77 @@
+import functools
+import sys
+
+import numpy as np
+import pytest
+
+import embedder
+
+SENTENCES = [
+    "How do I reset my password?",
+    "Why do I get error E-1042 when I sync the calendar?",
+    "Open the billing tab, pick the invoice and press export.",
+    "The mobile app does not show my notifications.",
+]
+MIN_COSINE = 0.98  # per sentence, against the full-precision torch embedding
+
+
+@pytest.fixture(scope="module")
+def local_model():
+    """Load MODEL_NAME from the local cache only; skip when it was never downloaded."""
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    offline = functools.partial(sentence_transformers.SentenceTransformer, local_files_only=True)
+    try:
+        reference = offline(embedder.MODEL_NAME, device="cpu")
+    except Exception as e:
+        pytest.skip(f"{embedder.MODEL_NAME} is not cached locally ({type(e).__name__})")
+    patch = pytest.MonkeyPatch()
+    patch.setattr(sentence_transformers, "SentenceTransformer", offline)
+    yield reference
+    patch.undo()
+
+
+def cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+@pytest.mark.parametrize("backend", ["int8", "onnx"])
+def test_backend_matches_torch_embeddings(local_model, backend):
+    if backend == "onnx":
+        try:
+            embedder._require_onnx_support()
+        except ImportError as e:
+            pytest.skip(str(e))
+    model = embedder.load_model(backend)
+    expected = np.asarray(local_model.encode(SENTENCES), dtype=np.float32)
+    actual = np.asarray(model.encode(SENTENCES), dtype=np.float32)
+    assert actual.shape == expected.shape
+    assert cosines(actual, expected).min() >= MIN_COSINE
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown embedding backend 'cuda'"):
+        embedder.load_model("cuda")
+
+
+def test_onnx_needs_a_recent_sentence_transformers(monkeypatch):
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    monkeypatch.setattr(sentence_transformers, "__version__", "2.7.0")
+    with pytest.raises(ImportError, match=r"sentence-transformers>=3\.2, found 2\.7\.0"):
+        embedder._require_onnx_support()
+
+
+def test_onnx_needs_onnxruntime(monkeypatch):
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    monkeypatch.setattr(sentence_transformers, "__version__", "3.2.0")
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)  # makes `import onnxruntime` fail
+    with pytest.raises(ImportError, match="needs onnxruntime") as error:
+        embedder._require_onnx_support()
+    assert error.value.name == "onnxruntime"
+
+
+def test_load_model_reports_missing_onnx_support(monkeypatch):
+    pytest.importorskip("torch")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    monkeypatch.setattr(sentence_transformers, "__version__", "2.7.0")
+    with pytest.raises(ImportError, match=r"pip install 'sentence-transformers\[onnx\]>=3\.2'"):
+        embedder.load_model("onnx")
@@ -0,0 +1,109 @@
+### tests/test_embedding_store.py
+import os
+import stat
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore
+
+
+def vectors(n: int, dim: int = 4, start: int = 0) -> np.ndarray:
+    return np.arange(start * dim, (start + n) * dim, dtype=np.float32).reshape(n, dim)
+
+
+def assert_vectors(store, keys, expected):
+    found = store.get_many(keys)
+    assert list(found) == keys
+    np.testing.assert_array_equal(np.stack([found[key] for key in keys]), expected)
+
+
+def test_round_trip_through_snapshot_and_log(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    store.put_many(["a", "b"], vectors(2))  # first put writes the snapshot
+    store.put_many(["c"], vectors(1, start=2))  # later puts go to the key log
+    assert (tmp_path / "keys.log").read_text(encoding="utf-8") == "c\t2\n"
+
+    reopened = EmbeddingStore(tmp_path)
+    assert len(reopened) == 3
+    assert_vectors(reopened, ["a", "b", "c"], vectors(3))
+    assert reopened.get_many(["missing"]) == {}
+
+
+def test_torn_key_log_line_is_dropped(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    store.put_many(["a"], vectors(1))
+    store.put_many(["b"], vectors(1, start=1))
+    with open(tmp_path / "keys.log", "a", encoding="utf-8") as f:
+        f.write("c\t")  # interrupted mid-line
+
+    reopened = EmbeddingStore(tmp_path)
+    assert "c" not in reopened
+    assert (tmp_path / "keys.log").read_text(encoding="utf-8") == "b\t1\n"
+
+    # Appending after the truncated tail keeps the log parseable
+    reopened.put_many(["c"], vectors(1, start=2))
+    assert_vectors(EmbeddingStore(tmp_path), ["a", "b", "c"], vectors(3))
+
+
+def test_partial_vector_row_is_overwritten(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    store.put_many(["a", "b"], vectors(2))
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\x00\x01\x02")  # interrupted before its key was logged
+
+    reopened = EmbeddingStore(tmp_path)
+    assert_vectors(reopened, ["a", "b"], vectors(2))
+    reopened.put_many(["c"], vectors(1, start=2))
+    assert (tmp_path / "vectors.f32").stat().st_size == 3 * 4 * 4
+    assert_vectors(EmbeddingStore(tmp_path), ["a", "b", "c"], vectors(3))
+
+
+def test_key_log_is_compacted_into_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingStore, "COMPACT_AFTER", 2)
+    store = EmbeddingStore(tmp_path)
+    store.put_many(["a"], vectors(1))
+    store.put_many(["b"], vectors(1, start=1))
+    store.put_many(["c", "d"], vectors(2, start=2))  # would push the log past 2 entries
+
+    assert (tmp_path / "keys.log").read_text(encoding="utf-8") == ""
+    assert_vectors(EmbeddingStore(tmp_path), ["a", "b", "c", "d"], vectors(4))
+
+
+def test_key_log_survives_a_crash_before_the_snapshot_is_durable(tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingStore, "COMPACT_AFTER", 2)
+    store = EmbeddingStore(tmp_path)
+    store.put_many(["a"], vectors(1))
+    store.put_many(["b"], vectors(1, start=1))
+
+    events = []
+    real_fsync, real_replace = os.fsync, os.replace
+
+    def fsync(fd):
+        if stat.S_ISDIR(os.fstat(fd).st_mode):
+            events.append("fsync dir")
+            raise OSError("crashed before the directory was synced")
+        events.append("fsync file")
+        real_fsync(fd)
+
+    def replace(src, dst):
+        events.append("replace")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    monkeypatch.setattr(os, "replace", replace)
+    with pytest.raises(OSError):
+        store.put_many(["c", "d"], vectors(2, start=2))  # compacts the log into the snapshot
+
+    # vectors, snapshot temp file, rename, directory; the log is only cleared after all of them
+    assert events == ["fsync file", "fsync file", "replace", "fsync dir"]
+    assert (tmp_path / "keys.log").read_text(encoding="utf-8") == "b\t1\n"
+    monkeypatch.undo()
+    assert_vectors(EmbeddingStore(tmp_path), ["a", "b", "c", "d"], vectors(4))
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    store = EmbeddingStore(tmp_path)
+    store.put_many(["a"], vectors(1))
+    with pytest.raises(ValueError):
+        store.put_many(["b"], vectors(1, dim=8))
@@ -0,0 +1,90 @@
+### tests/test_indexer.py
+import faiss
+import numpy as np
+import pytest
+
+import embedder
+import index_files
+import indexer
+import search
+from faiss_index import factory_string, prepare_vectors
+
+
+def faq(i: int, service: str) -> dict:
+    return {"text": f"Q: How do I configure widget {i}?\nA: Open panel {i % 7} and set option {i}.",
+            "source": "sheet", "service": service, "origin": f"faq-{service}", "type": "faq"}
+
+
+CORPUS = [faq(i, "billing" if i % 2 else "auth") for i in range(600)]
+# 2-bit codebooks are trainable on 300-vector shards, so PQ is really exercised (and fast);
+# nprobe covers every list so IVF results are exact
+INDEX_CONFIGS = {
+    "flat": {"type": "flat"},
+    "ivf_flat": {"type": "ivf_flat", "nlist": 8, "nprobe": 8},
+    "ivf_pq": {"type": "ivf_pq", "nlist": 8, "nprobe": 8, "pq_m": 8, "pq_nbits": 2},
+    "hnsw": {"type": "hnsw", "hnsw_m": 16},
+    "pq": {"type": "pq", "pq_m": 8, "pq_nbits": 2},
+}
+EXACT = {"flat", "ivf_flat", "hnsw"}
+
+
+def build(monkeypatch, chunks, incremental):
+    monkeypatch.setattr(indexer, "iter_sheet_chunks", lambda: iter([list(chunks)]))
+    return indexer.build_index(incremental=incremental)
+
+
+@pytest.mark.parametrize("index_type", sorted(INDEX_CONFIGS))
+def test_incremental_build_with_removals_keeps_ids_correct(index_type, monkeypatch, stub_model):
+    monkeypatch.setattr(embedder, "_model", stub_model)
+    monkeypatch.setattr(indexer, "iter_video_chunks", lambda: iter([]))
+    for key, value in INDEX_CONFIGS[index_type].items():
+        monkeypatch.setitem(indexer.index_config, key, value)
+
+    build(monkeypatch, CORPUS, incremental=False)
+    removed_chunks, kept_chunks = CORPUS[:100], CORPUS[100:] + [faq(i, "auth") for i in range(1000, 1010)]
+    _, known, version = build(monkeypatch, kept_chunks, incremental=True)
+
+    removed_ids = set(range(100))  # ids are assigned in corpus order on the full build
+    assert removed_ids.isdisjoint(known.values())
+    ids = np.array([known[indexer.chunk_hash(chunk)] for chunk in kept_chunks])
+    assert ids[-1] == 609  # new chunks get fresh ids after the removed ones
+
+    index = faiss.read_index(str(index_files.paths(version)["index"]))
+    assert index.ntotal == len(kept_chunks)
+    search.apply_search_params(index, indexer.index_config)
+    vectors = prepare_vectors(stub_model.encode([chunk["text"] for chunk in kept_chunks]), index.metric_type)
+    _, found = index.search(vectors, 5)
+    assert removed_ids.isdisjoint(found.ravel().tolist())
+    if index_type in EXACT:
+        assert (found[:, 0] == ids).all()
+    else:
+        assert np.mean([chunk_id in row for chunk_id, row in zip(ids, found)]) >= 0.8
+
+    # The running bot loads this version (hybrid search reconstructs vectors by id)
+    engine = search.SearchEngine()
+    engine._answers = None
+    results = engine.search(kept_chunks[-1]["text"])
+    assert any(chunk == kept_chunks[-1] for group in results for chunk in group["chunks"])
+
+
+@pytest.mark.parametrize("index_type", ["pq", "ivf_pq"])
+def test_pq_falls_back_below_trainable_size(index_type):
+    cfg = {"type": index_type, "pq_m": 16, "pq_nbits": 8}
+    assert "PQ16x8" not in factory_string(cfg, 255)
+    assert "PQ16x8" not in factory_string(cfg, 378)
+    assert "PQ16x8" in factory_string(cfg, 39 * 256)
+
+
+def test_pq_build_with_small_service_shards(monkeypatch, stub_model):
+    # Default 8-bit codebooks: a 40-chunk shard can't even be trained, 300 chunks are too few
+    monkeypatch.setattr(embedder, "_model", stub_model)
+    monkeypatch.setattr(indexer, "iter_video_chunks", lambda: iter([]))
+    monkeypatch.setitem(indexer.index_config, "type", "pq")
+    corpus = CORPUS + [faq(i, "tiny") for i in range(2000, 2040)]
+    _, known, version = build(monkeypatch, corpus, incremental=False)
+
+    assert len(known) == len(corpus)
+    for service, size in (("auth", 300), ("billing", 300), ("tiny", 40)):
+        shard = faiss.read_index(str(index_files.shard_path(version, service)))
+        assert shard.ntotal == size
+        assert isinstance(faiss.downcast_index(shard.index), faiss.IndexScalarQuantizer)
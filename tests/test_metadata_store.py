@@ -0,0 +1,68 @@
+### tests/test_metadata_store.py
+import pytest
+
+from metadata_store import FORMAT_VERSION, HEADER, MAGIC, MetadataStore, MetadataWriter
+
+
+def write_store(path, chunks: dict):
+    with MetadataWriter(path) as writer:
+        for chunk_id, chunk in chunks.items():
+            writer.write(chunk_id, chunk)
+    return MetadataStore(path)
+
+
+def test_round_trip_in_any_write_order(tmp_path):
+    chunks = {2: {"text": "Wie setze ich das Passwort zurück?"}, 0: {"text": "a", "steps": ["x"]}, 1: {"text": "b"}}
+    store = write_store(tmp_path / "meta.bin", chunks)
+    assert len(store) == 3
+    assert store[2] == chunks[2]
+    assert dict(store.items()) == chunks
+
+
+def test_removed_ids_read_as_missing(tmp_path):
+    # Incremental builds leave holes where chunks were deleted
+    store = write_store(tmp_path / "meta.bin", {0: {"text": "a"}, 3: {"text": "d"}})
+    assert len(store) == 4
+    assert store.get(1) is None and store.get(2) is None
+    assert [chunk_id for chunk_id, _ in store.items()] == [0, 3]
+
+
+def test_trailing_and_out_of_range_ids(tmp_path):
+    # Removing the highest ids shrinks the table; lookups past its end are misses, not errors
+    store = write_store(tmp_path / "meta.bin", {0: {"text": "a"}, 1: {"text": "b"}})
+    assert store.get(2) is None
+    assert store.get(10_000) is None
+    assert store.get(-1) is None
+
+
+def test_empty_store(tmp_path):
+    store = write_store(tmp_path / "meta.bin", {})
+    assert len(store) == 0
+    assert list(store.items()) == []
+    assert store.get(0) is None
+
+
+@pytest.mark.parametrize("magic, version", [(b"NOPE", FORMAT_VERSION), (MAGIC, FORMAT_VERSION + 1)])
+def test_bad_magic_or_version_is_rejected(tmp_path, magic, version):
+    path = tmp_path / "meta.bin"
+    write_store(path, {0: {"text": "a"}})
+    data = bytearray(path.read_bytes())
+    _, _, count, table_pos = HEADER.unpack_from(data, 0)
+    HEADER.pack_into(data, 0, magic, version, count, table_pos)
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError):
+        MetadataStore(path)
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / "meta.bin"
+    write_store(path, {0: {"text": "old"}})
+
+    with pytest.raises(RuntimeError):
+        with MetadataWriter(path) as writer:
+            writer.write(0, {"text": "new"})
+            raise RuntimeError("build interrupted")
+
+    assert MetadataStore(path)[0] == {"text": "old"}
+    assert not path.with_name(path.name + ".tmp").exists()
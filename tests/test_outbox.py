@@ -0,0 +1,201 @@
+### tests/test_outbox.py
+import threading
+import time
+
+import pytest
+
+from workers import outbox as outbox_module
+from workers.outbox import Outbox
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "outbox.sqlite3"
+
+
+def jobs(outbox):
+    return outbox._conn.execute(
+        "SELECT id, kind, status, attempts, next_attempt_at, last_error FROM outbox ORDER BY id"
+    ).fetchall()
+
+
+def make_due(outbox):
+    outbox._conn.execute("UPDATE outbox SET next_attempt_at = 0")
+
+
+def failing(**payload):
+    raise RuntimeError("service down")
+
+
+def test_successful_job_is_acked(db_path):
+    outbox = Outbox(db_path)
+    received = []
+    outbox.register("ticket", lambda **payload: received.append(payload))
+    outbox.enqueue("ticket", subject="hi")
+
+    assert outbox.drain_once()
+    assert received == [{"subject": "hi"}]
+    assert jobs(outbox) == []
+    assert not outbox.drain_once()
+
+
+def test_running_jobs_are_requeued_on_reopen(db_path):
+    crashed = Outbox(db_path)
+    crashed.enqueue("ticket", subject="hi")
+    assert crashed._claim()  # claimed, then the process "dies" before ack
+    assert jobs(crashed)[0][2] == "running"
+
+    reopened = Outbox(db_path)
+    assert [job[2] for job in jobs(reopened)] == ["pending"]
+    received = []
+    reopened.register("ticket", lambda **payload: received.append(payload))
+    assert reopened.drain_once()
+    assert received == [{"subject": "hi"}]
+
+
+def test_failed_job_is_retried_with_backoff(db_path):
+    outbox = Outbox(db_path)
+    outbox.register("ticket", failing)
+    outbox.enqueue("ticket", subject="hi")
+
+    before = time.time()
+    assert outbox.drain_once()
+    (_, _, status, attempts, next_attempt_at, last_error), = jobs(outbox)
+    assert (status, attempts, last_error) == ("pending", 1, "service down")
+    # First retry waits BASE_BACKOFF scaled by jitter in [0.5, 1.0]
+    assert next_attempt_at >= before + outbox_module.BASE_BACKOFF * 0.5
+    assert not outbox.drain_once()  # not due yet
+
+    make_due(outbox)
+    assert outbox.drain_once()
+    assert jobs(outbox)[0][3] == 2
+
+
+def test_job_is_dead_after_max_attempts(db_path, monkeypatch):
+    monkeypatch.setattr(outbox_module, "MAX_ATTEMPTS", 3)
+    outbox = Outbox(db_path)
+    outbox.register("ticket", failing)
+    outbox.enqueue("ticket", subject="hi")
+
+    for _ in range(3):
+        make_due(outbox)
+        assert outbox.drain_once()
+    (_, _, status, attempts, _, _), = jobs(outbox)
+    assert (status, attempts) == ("dead", 3)
+
+    make_due(outbox)
+    assert not outbox.drain_once()  # dead jobs are never claimed again
+    assert outbox.depth() == 0
+
+
+def test_unregistered_kind_is_retried_not_dropped(db_path):
+    outbox = Outbox(db_path)
+    outbox.enqueue("mystery", value=1)
+
+    assert outbox.drain_once()
+    (_, kind, status, attempts, _, last_error), = jobs(outbox)
+    assert (kind, status, attempts) == ("mystery", "pending", 1)
+    assert "No outbox handler registered for 'mystery'" in last_error
+
+    # Registering the handler later (e.g. after a deploy) delivers the job
+    received = []
+    outbox.register("mystery", lambda **payload: received.append(payload))
+    make_due(outbox)
+    assert outbox.drain_once()
+    assert received == [{"value": 1}]
+
+
+def test_batched_kind_is_acked_or_retried_together(db_path):
+    outbox = Outbox(db_path)
+    batches, fail = [], [True]
+
+    def handler(payloads):
+        if fail[0]:
+            raise RuntimeError("sheets down")
+        batches.append([payload["n"] for payload in payloads])
+
+    outbox.register("staging_qa", handler, batch_size=3)
+    outbox.register("ticket", lambda **payload: None)
+    for n in range(4):
+        outbox.enqueue("staging_qa", n=n)
+    outbox.enqueue("ticket", subject="hi")
+
+    assert outbox.drain_once()
+    assert [(job[2], job[3]) for job in jobs(outbox)[:4]] == [("pending", 1)] * 3 + [("pending", 0)]
+
+    fail[0] = False
+    make_due(outbox)
+    while outbox.drain_once():
+        pass
+    assert batches == [[0, 1, 2], [3]]
+    assert jobs(outbox) == []
+
+
+def test_batched_kind_waits_for_size_or_age(db_path):
+    outbox = Outbox(db_path)
+    batches = []
+    outbox.register("staging_qa", lambda payloads: batches.append([p["n"] for p in payloads]),
+                    batch_size=3, max_delay=60)
+    outbox.register("ticket", lambda **payload: None)
+
+    outbox.enqueue("staging_qa", n=0)
+    outbox.enqueue("staging_qa", n=1)
+    outbox.enqueue("ticket", subject="hi")
+    assert outbox.drain_once()  # the ticket goes ahead of the not-yet-full batch
+    assert not outbox.drain_once()
+    assert batches == []
+
+    outbox.enqueue("staging_qa", n=2)  # size threshold reached
+    assert outbox.drain_once()
+    assert batches == [[0, 1, 2]]
+
+    outbox.enqueue("staging_qa", n=3)
+    assert not outbox.drain_once()
+    outbox._conn.execute("UPDATE outbox SET created_at = created_at - 61")  # age threshold reached
+    assert outbox.drain_once()
+    assert batches == [[0, 1, 2], [3]]
+
+
+def test_one_batch_per_kind_in_flight(db_path):
+    outbox = Outbox(db_path)
+    outbox.register("staging_qa", lambda payloads: None, batch_size=2)
+    for n in range(4):
+        outbox.enqueue("staging_qa", n=n)
+
+    assert len(outbox._claim()) == 2
+    assert outbox._claim() == []  # another worker must not write the same tab concurrently
+    outbox._in_flight.clear()
+    assert len(outbox._claim()) == 2
+
+
+def test_steady_traffic_is_batched(db_path, monkeypatch):
+    # Scaled-down production shape: rows arrive faster than max_delay, writes are slow
+    monkeypatch.setattr(outbox_module, "POLL_INTERVAL", 0.01)
+    outbox = Outbox(db_path)
+    calls, writing, overlapped = [], threading.Lock(), []
+
+    def append_rows(payloads):
+        if not writing.acquire(blocking=False):
+            overlapped.append(len(payloads))
+            return
+        try:
+            time.sleep(0.03)
+            calls.append(len(payloads))
+        finally:
+            writing.release()
+
+    outbox.register("staging_qa", append_rows, batch_size=50, max_delay=0.2)
+    outbox.start(workers=2)
+    try:
+        for n in range(100):
+            outbox.enqueue("staging_qa", n=n)
+            time.sleep(0.005)
+        deadline = time.time() + 5
+        while sum(calls) < 100 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        outbox.stop()
+
+    assert sum(calls) == 100
+    assert len(calls) <= 6
+    assert overlapped == []
@@ -0,0 +1,62 @@
+### tests/test_query_batcher.py
+import threading
+
+import pytest
+
+from query_batcher import QueryBatcher
+
+
+def echo(queries, top_k, service, filters):
+    return [[query, top_k, service] for query in queries]
+
+
+def test_queries_in_one_window_share_a_call():
+    calls = []
+
+    def search_many(queries, top_k, service, filters):
+        calls.append(list(queries))
+        return echo(queries, top_k, service, filters)
+
+    batcher = QueryBatcher(search_many, max_wait_ms=50)
+    futures = [batcher.submit(f"q{i}") for i in range(3)] + [batcher.submit("other", service="billing")]
+    assert [f.result(timeout=1) for f in futures] == [["q0", 10, None], ["q1", 10, None], ["q2", 10, None],
+                                                      ["other", 10, "billing"]]
+    assert sorted(calls) == [["other"], ["q0", "q1", "q2"]]
+
+
+def test_cancelled_future_does_not_stop_the_thread():
+    release = threading.Event()
+
+    def slow_search_many(queries, top_k, service, filters):
+        release.wait(1)
+        return echo(queries, top_k, service, filters)
+
+    batcher = QueryBatcher(slow_search_many, max_wait_ms=1)
+    first = batcher.submit("first")
+    cancelled = batcher.submit("cancelled")
+    assert cancelled.cancel() or cancelled.running()  # cancelled before collection, or already running
+    release.set()
+    first.result(timeout=1)
+
+    later = batcher.submit("later")
+    assert later.result(timeout=1) == ["later", 10, None]
+    assert batcher._thread.is_alive()
+
+
+def test_failing_search_fails_only_its_futures():
+    def search_many(queries, top_k, service, filters):
+        if "boom" in queries:
+            raise RuntimeError("index not ready")
+        return echo(queries, top_k, service, filters)
+
+    batcher = QueryBatcher(search_many, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.submit("boom").result(timeout=1)
+    assert batcher.submit("fine").result(timeout=1) == ["fine", 10, None]
+
+
+def test_wrong_result_count_does_not_stop_the_thread():
+    batcher = QueryBatcher(lambda queries, *args: None, max_wait_ms=1)
+    with pytest.raises(TypeError):
+        batcher.submit("q").result(timeout=1)
+    assert batcher._thread.is_alive()
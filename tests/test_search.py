@@ -0,0 +1,64 @@
+### tests/test_search.py
+import numpy as np
+import pytest
+
+import embedder
+import indexer
+import search
+from semantic_cache import SemanticCache
+
+CHUNKS = [
+    {"text": "Q: How do I reset my password?\nA: Open the settings page and choose reset password.",
+     "source": "sheet", "service": "auth", "origin": "faq", "type": "faq"},
+    {"text": "Q: How do I export an invoice?\nA: Open billing, pick the invoice and press export.",
+     "source": "sheet", "service": "billing", "origin": "faq", "type": "faq"},
+    {"text": "Q: Why do I get error E-1042 on sync?\nA: Reconnect the calendar integration.",
+     "source": "sheet", "service": "integrations", "origin": "faq", "type": "faq"},
+]
+
+
+@pytest.fixture(scope="module")
+def engine(stub_model):
+    patch = pytest.MonkeyPatch()
+    patch.setattr(embedder, "_model", stub_model)
+    patch.setattr(indexer, "iter_video_chunks", lambda: iter([]))
+    patch.setattr(indexer, "iter_sheet_chunks", lambda: iter([list(CHUNKS)]))
+    indexer.build_index(incremental=False)
+    engine = search.SearchEngine()
+    engine._answers = None  # every test sees a real search, not a cached answer
+    yield engine
+    patch.undo()
+
+
+def test_related_query_is_answered(engine):
+    results = engine.search("how do i reset my password")
+    assert results[0]["chunks"][0] == CHUNKS[0]
+    assert results[0]["score"] <= search.DISTANCE_THRESHOLD
+
+
+def test_single_shared_word_is_not_an_answer(engine):
+    # "settings" matches the password FAQ in BM25, but the query is about something else
+    assert engine.search("weather forecast settings tomorrow") == []
+
+
+def test_lexical_hits_within_threshold_are_kept(engine, monkeypatch):
+    monkeypatch.setattr(search, "LEXICAL_DISTANCE_THRESHOLD", np.inf)
+    results = engine.search("weather forecast settings tomorrow")
+    assert [group["chunks"][0] for group in results] == [CHUNKS[0]]
+
+
+def test_semantic_cache_keeps_exact_terms_apart(engine, monkeypatch):
+    # Embeddings alone would treat these as the same question (any distance counts as near)
+    monkeypatch.setattr(engine, "_answers", SemanticCache(max_distance=np.inf))
+    first = engine.search("why do i get error E-1042 on sync")
+    assert engine.search("why do i get error E-1042 on sync") is first  # a true repeat is cached
+
+    other_code = engine.search("why do i get error E-2001 on sync")
+    assert other_code is not first
+
+
+def test_semantic_cache_answers_paraphrases(engine, monkeypatch):
+    # Plain words are not part of the scope, so a reworded question reuses the cached answer
+    monkeypatch.setattr(engine, "_answers", SemanticCache(max_distance=np.inf))
+    first = engine.search("how do i reset my password")
+    assert engine.search("how can i change the password in settings") is first
@@ -0,0 +1,134 @@
+### tests/test_zammad_client.py
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ttl_cache import TTLCache
+from zammad import zammad_client
+from zammad.zammad_client import AsyncZammadClient, ZammadClient
+
+USER = {"email": "Ann@Example.com", "firstname": "Ann", "lastname": "Lee"}
+
+
+class StubZammad(BaseHTTPRequestHandler):
+    """Minimal Zammad API: users/search, users and tickets, recording every request."""
+
+    def _reply(self, status: int, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.server.calls.append(("GET", self.path.split("?")[0]))
+        if self.path.startswith("/api/v1/users/search"):
+            self._reply(200, [{"id": self.server.user_id}] if self.server.user_exists else [])
+        else:
+            self._reply(404, {})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.calls.append(("POST", self.path))
+        if self.path == "/api/v1/users":
+            self.server.user_exists = True
+            self._reply(201, {"id": self.server.user_id, "email": body["email"]})
+        elif self.path == "/api/v1/tickets":
+            if self.server.ticket_status >= 400:
+                self._reply(self.server.ticket_status, {"error": "customer not found"})
+            else:
+                self._reply(201, {"id": 42, "customer_id": body["customer_id"]})
+        else:
+            self._reply(404, {})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubZammad)
+    httpd.calls, httpd.user_exists, httpd.user_id, httpd.ticket_status = [], True, 7, 201
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.api = f"http://127.0.0.1:{httpd.server_address[1]}/api/v1"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_known_user_costs_one_post(server):
+    client = ZammadClient(api=server.api)
+    assert client.create_ticket("first", "body", USER)["customer_id"] == 7
+    assert server.calls == [("GET", "/api/v1/users/search"), ("POST", "/api/v1/tickets")]
+
+    server.calls.clear()
+    client.create_ticket("second", "body", USER)
+    assert server.calls == [("POST", "/api/v1/tickets")]
+
+
+def test_unknown_user_is_created_once(server):
+    server.user_exists = False
+    client = ZammadClient(api=server.api)
+    client.create_ticket("first", "body", USER)
+    client.create_ticket("second", "body", USER)
+    assert server.calls == [
+        ("GET", "/api/v1/users/search"), ("POST", "/api/v1/users"),
+        ("POST", "/api/v1/tickets"), ("POST", "/api/v1/tickets"),
+    ]
+
+
+def test_cached_id_is_dropped_after_failed_ticket_post(server):
+    client = ZammadClient(api=server.api)
+    client.create_ticket("first", "body", USER)
+    assert client.user_ids.get("ann@example.com") == 7
+
+    server.ticket_status = 422
+    with pytest.raises(Exception):
+        client.create_ticket("second", "body", USER)
+    assert client.user_ids.get("ann@example.com") is None
+
+    server.ticket_status, server.user_id = 201, 8  # e.g. the user was merged into another one
+    server.calls.clear()
+    assert client.create_ticket("third", "body", USER)["customer_id"] == 8
+    assert server.calls == [("GET", "/api/v1/users/search"), ("POST", "/api/v1/tickets")]
+
+
+def test_async_client_caches_and_drops_ids_the_same_way(server):
+    async def scenario():
+        client = AsyncZammadClient(api=server.api, user_ids=TTLCache())
+        try:
+            await client.create_ticket("first", "body", USER)
+            server.calls.clear()
+            await client.create_ticket("second", "body", USER)
+            assert server.calls == [("POST", "/api/v1/tickets")]
+
+            server.ticket_status = 422
+            with pytest.raises(Exception):
+                await client.create_ticket("third", "body", USER)
+            assert client.user_ids.get("ann@example.com") is None
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_async_client_shares_the_sync_user_cache_by_default(server, monkeypatch):
+    monkeypatch.setattr(zammad_client, "client", ZammadClient(api=server.api, user_ids=TTLCache()))
+    zammad_client.client.create_ticket("sync", "body", USER)
+
+    async def scenario():
+        client = AsyncZammadClient(api=server.api)
+        try:
+            assert client.user_ids is zammad_client.client.user_ids
+            server.calls.clear()
+            await client.create_ticket("async", "body", USER)
+            assert server.calls == [("POST", "/api/v1/tickets")]
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
@@ -1,13 +1,23 @@
 ### video_qa_extractor.py
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterator, List, Dict, Tuple
 import logging
 
+from config.config_loader import load_config_yaml
+
 logger = logging.getLogger(__name__)
 
 ENRICHED_DIR = Path("data/enriched_video_data")
+VIDEO_WORKERS = int(load_config_yaml().get("index", {}).get("extraction", {}).get("video_workers", 8))
+
+def step_label(step) -> str:
+    # key_steps entries are plain strings or {"step": ..., ...} dicts
+    if isinstance(step, dict):
+        return str(step.get("step", step)).strip()
+    return str(step).strip()
 
 def extract_chunks_from_video_json(file_path: Path, service: str) -> List[Dict]:
     chunks = []
@@ -42,7 +52,9 @@ def extract_chunks_from_video_json(file_path: Path, service: str) -> List[Dict]:
             "origin": video_id,
             "type": "steps",
             "url": video_url,
-            "title": data.get("title")
+            "title": data.get("title"),
+            # Display form, parsed once here so answers never re-parse the embedded text
+            "steps": [step_label(step) for step in steps]
         })
 
     for pair in data.get("common_questions_and_answers", []):
@@ -61,16 +73,24 @@ def extract_chunks_from_video_json(file_path: Path, service: str) -> List[Dict]:
 
     return chunks
 
+def video_files() -> List[Tuple[Path, str]]:
+    """(json path, service) for every enriched video; the service is its parent directory."""
+    return [
+        (file, service_dir.name)
+        for service_dir in ENRICHED_DIR.iterdir() if service_dir.is_dir()
+        for file in service_dir.glob("*.json")
+    ]
+
+def iter_video_chunks(workers: int = VIDEO_WORKERS) -> Iterator[List[Dict]]:
+    """Read and parse video JSON on a thread pool, yielding each file's chunks in file order."""
+    files = video_files()
+    if not files:
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="video") as pool:
+        yield from pool.map(lambda job: extract_chunks_from_video_json(*job), files)
+
 def extract_all_video_chunks() -> List[Dict]:
-    all_chunks = []
-    for service_dir in ENRICHED_DIR.iterdir():
-        if not service_dir.is_dir():
-            continue
-        service = service_dir.name
-        for file in service_dir.glob("*.json"):
-            chunks = extract_chunks_from_video_json(file, service)
-            all_chunks.extend(chunks)
-    return all_chunks
+    return [chunk for chunks in iter_video_chunks() for chunk in chunks]
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
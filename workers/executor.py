@@ -0,0 +1,30 @@
+### workers/executor.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from config.config_loader import load_config_yaml
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+config = load_config_yaml()
+executor_cfg = config.get("bot", {}).get("executor", {})
+IO_WORKERS = int(executor_cfg.get("io_workers", 8))
+
+# Embedding/FAISS work runs on the search micro-batcher (search.submit_search);
+# this pool is only for blocking network calls made from handlers.
+_io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking network call (Sheets, Zammad) on the I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_pool, partial(func, *args, **kwargs))
+
+
+def shutdown_executors(wait: bool = True):
+    """Stop accepting work and, by default, wait for in-flight calls to finish."""
+    logger.info("🛑 Shutting down worker pools")
+    _io_pool.shutdown(wait=wait)
@@ -0,0 +1,213 @@
+### workers/outbox.py
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import metrics
+from config.config_loader import load_config_yaml
+
+logger = logging.getLogger(__name__)
+
+# === CONFIG ===
+config = load_config_yaml()
+outbox_cfg = config.get("outbox", {})
+OUTBOX_PATH = Path(outbox_cfg.get("path", "data/outbox.sqlite3"))
+OUTBOX_WORKERS = int(outbox_cfg.get("workers", 2))
+MAX_ATTEMPTS = int(outbox_cfg.get("max_attempts", 10))
+BASE_BACKOFF = float(outbox_cfg.get("base_backoff", 2.0))
+MAX_BACKOFF = float(outbox_cfg.get("max_backoff", 600.0))
+POLL_INTERVAL = float(outbox_cfg.get("poll_interval", 1.0))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+class Outbox:
+    """
+    Durable SQLite queue of side effects (tickets, staging rows, user tracking).
+    Jobs survive restarts; rows left 'running' by a crash are re-queued on open.
+    """
+
+    def __init__(self, path: Path = OUTBOX_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._handlers: Dict[str, Callable] = {}
+        self._batching: Dict[str, Tuple[int, float]] = {}  # kind -> (batch_size, max_delay)
+        self._in_flight = set()  # batched kinds with a batch being handled
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._rate_window = (time.time(), 0)
+
+        with self._lock:
+            recovered = self._conn.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'running'"
+            ).rowcount
+        if recovered:
+            logger.warning(f"♻️ Re-queued {recovered} outbox jobs interrupted by a previous shutdown")
+        self._update_depth()
+
+    # --- producer side ---
+
+    def register(self, kind: str, handler: Callable, batch_size: int = 1, max_delay: float = 0.0):
+        """
+        Handler is called as handler(**payload) on a worker thread. With batch_size > 1 it is
+        called as handler([payload, ...]) with up to batch_size due jobs of this kind, which are
+        acked or retried together. Such a batch is only claimed once batch_size jobs are due or
+        the oldest has waited max_delay seconds, and only one batch per kind runs at a time.
+        """
+        self._handlers[kind] = handler
+        self._batching[kind] = (batch_size, max_delay)
+
+    def enqueue(self, kind: str, **payload):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (kind, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), now, now),
+            )
+        metrics.inc("outbox.enqueued")
+        self._update_depth()
+        self._wakeup.set()
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'running')"
+            ).fetchone()[0]
+
+    # --- consumer side ---
+
+    def _claim(self) -> list:
+        """
+        Due jobs of the kind with the oldest due job: one job, or for a batched kind up to
+        batch_size of them. Batched kinds below their size-or-age threshold, or with a batch
+        already in flight, are passed over in favour of other kinds.
+        """
+        with self._lock:
+            now = time.time()
+            due = self._conn.execute(
+                "SELECT kind, COUNT(*), MIN(created_at) FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? GROUP BY kind ORDER BY MIN(id)",
+                (now,),
+            ).fetchall()
+            for kind, count, oldest in due:
+                batch_size, max_delay = self._batching.get(kind, (1, 0.0))
+                if batch_size > 1 and (kind in self._in_flight or (count < batch_size and now - oldest < max_delay)):
+                    continue
+                rows = self._conn.execute(
+                    "SELECT id, kind, payload, attempts, created_at FROM outbox "
+                    "WHERE status = 'pending' AND next_attempt_at <= ? AND kind = ? ORDER BY id LIMIT ?",
+                    (now, kind, batch_size),
+                ).fetchall()
+                self._conn.executemany("UPDATE outbox SET status = 'running' WHERE id = ?", [(r[0],) for r in rows])
+                if batch_size > 1:
+                    self._in_flight.add(kind)
+                return rows
+        return []
+
+    def _ack(self, job_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (job_id,))
+
+    def _retry(self, job_id: int, attempts: int, error: str):
+        if attempts >= MAX_ATTEMPTS:
+            status, next_at = "dead", time.time()
+            logger.error(f"☠️ Outbox job {job_id} gave up after {attempts} attempts: {error}")
+            metrics.inc("outbox.dead")
+        else:
+            # Exponential backoff with jitter so a recovering service is not hit by a burst
+            delay = min(MAX_BACKOFF, BASE_BACKOFF * (2 ** (attempts - 1)))
+            status, next_at = "pending", time.time() + delay * random.uniform(0.5, 1.0)
+            logger.warning(f"🔁 Outbox job {job_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, next_at, error, job_id),
+            )
+
+    def _update_depth(self):
+        metrics.set_gauge("outbox.depth", self.depth())
+
+    def drain_once(self) -> bool:
+        """Process one due job (or batch of jobs). Returns False when nothing was due."""
+        rows = self._claim()
+        if not rows:
+            return False
+
+        kind = rows[0][1]
+        handler = self._handlers.get(kind)
+        batched = self._batching.get(kind, (1, 0.0))[0] > 1
+        try:
+            if handler is None:
+                raise KeyError(f"No outbox handler registered for '{kind}'")
+            if batched:
+                handler([json.loads(payload) for _, _, payload, _, _ in rows])
+            else:
+                handler(**json.loads(rows[0][2]))
+        except Exception as e:
+            for job_id, _, _, attempts, _ in rows:
+                metrics.inc("outbox.failed")
+                self._retry(job_id, attempts + 1, str(e))
+        else:
+            for job_id, _, _, _, created_at in rows:
+                self._ack(job_id)
+                metrics.inc("outbox.drained")
+                metrics.observe("outbox.delivery_latency_s", time.time() - created_at)
+                self._record_drained()
+        finally:
+            if batched:
+                with self._lock:
+                    self._in_flight.discard(kind)
+        self._update_depth()
+        return True
+
+    def _record_drained(self):
+        with self._lock:
+            window_start, drained = self._rate_window
+            drained += 1
+            elapsed = time.time() - window_start
+            if elapsed >= 10:
+                metrics.set_gauge("outbox.drain_rate_per_s", drained / elapsed)
+                window_start, drained = time.time(), 0
+            self._rate_window = (window_start, drained)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.drain_once():
+                self._wakeup.wait(POLL_INTERVAL)
+                self._wakeup.clear()
+
+    def start(self, workers: int = OUTBOX_WORKERS):
+        for n in range(workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"📮 Outbox started with {workers} workers, {self.depth()} jobs pending")
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        logger.info(f"📪 Outbox stopped, {self.depth()} jobs left for next start")
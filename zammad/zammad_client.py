@@ -1,7 +1,12 @@
 import os
 import json  # ✅ Needed for debug log
 import requests
+import httpx
 import logging
+from requests.adapters import HTTPAdapter
+
+from config.config_loader import load_config_yaml
+from ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -14,55 +19,30 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
-def find_user_by_email(email: str):
-    try:
-        res = requests.get(f"{ZAMMAD_API}/users/search?query={email}", headers=HEADERS)
-        res.raise_for_status()
-        users = res.json()
-        return users[0] if users else None
-    except Exception as e:
-        logger.error(f"❌ Failed to search user in Zammad: {e}")
-        return None
-
-def create_user(email: str, firstname: str = "", lastname: str = ""):
-    try:
-        payload = {
-            "email": email,
-            "firstname": firstname,
-            "lastname": lastname,
-            "login": email
-        }
-        print("==== ZAMMAD PAYLOAD ====")
-        print(json.dumps(payload, indent=2))
-        print("========================")
-        res = requests.post(f"{ZAMMAD_API}/users", json=payload, headers=HEADERS)
-        res.raise_for_status()
-        logger.info(f"👤 Created Zammad user: {email}")
-        return res.json()
-    except Exception as e:
-        logger.error(f"❌ Failed to create user in Zammad: {e}")
-        return None
+# === CONFIG ===
+config = load_config_yaml()
+zammad_cfg = config.get("zammad", {})
+POOL_SIZE = int(zammad_cfg.get("pool_size", 10))
+TIMEOUT = float(zammad_cfg.get("timeout", 10))
+USER_CACHE_SIZE = int(zammad_cfg.get("user_cache_size", 10000))
+USER_CACHE_TTL = float(zammad_cfg.get("user_cache_ttl", 3600))
+TICKET_GROUP = zammad_cfg.get("group", "Users")  # ⚠️ Make sure this group exists in Zammad
 
-def ensure_user(email: str, firstname: str, lastname: str):
-    email = email.lower().strip()
-    logger.debug(f"🔍 Ensuring user exists: {email} ({firstname} {lastname})")
-    user = find_user_by_email(email)
-    if user:
-        logger.debug(f"✅ Found existing Zammad user: {user['id']} ({email})")
-    else:
-        logger.debug(f"👤 No user found, creating new user: {email}")
-    return user or create_user(email, firstname, lastname)
 
-def create_ticket(subject: str, body: str, user_info: dict):
-    user = ensure_user(user_info["email"], user_info.get("firstname", ""), user_info.get("lastname", ""))
-    if not user:
-        logger.warning("⚠️ Ticket skipped — user not found/created")
-        return
+# === PAYLOADS (shared by the sync and async clients) ===
+def _user_payload(email: str, firstname: str, lastname: str) -> dict:
+    return {
+        "email": email,
+        "firstname": firstname,
+        "lastname": lastname,
+        "login": email
+    }
 
-    payload = {
+def _ticket_payload(subject: str, body: str, customer_id: int) -> dict:
+    return {
         "title": subject,
-        "group": "Users",  # ⚠️ Make sure this group exists in Zammad
-        "customer_id": user["id"],
+        "group": TICKET_GROUP,
+        "customer_id": customer_id,
         "article": {
             "subject": subject,
             "body": body,
@@ -71,28 +51,195 @@ def create_ticket(subject: str, body: str, user_info: dict):
         }
     }
 
-    try:
-        logger.debug(f"🧾 Zammad payload: {json.dumps(payload, indent=2)}")
-        res = requests.post(f"{ZAMMAD_API}/tickets", json=payload, headers=HEADERS)
-        res.raise_for_status()
-        logger.info(f"🎟️ Created Zammad ticket: {res.json().get('id')}")
-    except requests.exceptions.HTTPError as e:
-        if e.response is not None:
-            logger.error(f"❌ Zammad error details: {e.response.text}")
-        logger.error(f"❌ Failed to create Zammad ticket: {e}")
-    
-def update_ticket_feedback(ticket_id: int, feedback: str):
+def _log_http_error(e: Exception, action: str):
+    response = getattr(e, "response", None)
+    if response is not None:
+        logger.error(f"❌ Zammad error details: {response.text}")
+    logger.error(f"❌ Failed to {action}: {e}")
+
+
+class ZammadClient:
     """
-    Updates the Zammad ticket with answer_feedback custom field.
+    Keep-alive Zammad API client. Resolved email → user id pairs are cached, so
+    creating a ticket for a known user is a single POST.
     """
-    try:
-        payload = {
-            "custom_fields": {
-                "answer_feedback": feedback
+
+    def __init__(self, api: str = ZAMMAD_API, headers: dict = HEADERS, pool_size: int = POOL_SIZE,
+                 timeout: float = TIMEOUT, user_ids: TTLCache = None):
+        self.api = api.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # `is None`, not `or`: an empty TTLCache is falsy and would silently not be shared
+        self.user_ids = user_ids if user_ids is not None else TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+    def find_user_by_email(self, email: str):
+        try:
+            res = self.session.get(f"{self.api}/users/search", params={"query": email}, timeout=self.timeout)
+            res.raise_for_status()
+            users = res.json()
+            return users[0] if users else None
+        except Exception as e:
+            logger.error(f"❌ Failed to search user in Zammad: {e}")
+            return None
+
+    def create_user(self, email: str, firstname: str = "", lastname: str = ""):
+        try:
+            payload = _user_payload(email, firstname, lastname)
+            logger.debug(f"👤 Zammad user payload: {json.dumps(payload, indent=2)}")
+            res = self.session.post(f"{self.api}/users", json=payload, timeout=self.timeout)
+            res.raise_for_status()
+            logger.info(f"👤 Created Zammad user: {email}")
+            return res.json()
+        except Exception as e:
+            logger.error(f"❌ Failed to create user in Zammad: {e}")
+            return None
+
+    def ensure_user_id(self, email: str, firstname: str, lastname: str):
+        email = email.lower().strip()
+        if (user_id := self.user_ids.get(email)) is not None:
+            return user_id
+
+        logger.debug(f"🔍 Ensuring user exists: {email} ({firstname} {lastname})")
+        user = self.find_user_by_email(email)
+        if user:
+            logger.debug(f"✅ Found existing Zammad user: {user['id']} ({email})")
+        else:
+            logger.debug(f"👤 No user found, creating new user: {email}")
+            user = self.create_user(email, firstname, lastname)
+        if not user:
+            return None
+        self.user_ids.set(email, user["id"])
+        return user["id"]
+
+    def create_ticket(self, subject: str, body: str, user_info: dict):
+        email = user_info["email"].lower().strip()
+        customer_id = self.ensure_user_id(email, user_info.get("firstname", ""), user_info.get("lastname", ""))
+        if customer_id is None:
+            logger.warning("⚠️ Ticket skipped — user not found/created")
+            raise RuntimeError(f"Zammad user not found/created: {user_info['email']}")
+
+        payload = _ticket_payload(subject, body, customer_id)
+        try:
+            logger.debug(f"🧾 Zammad payload: {json.dumps(payload, indent=2)}")
+            res = self.session.post(f"{self.api}/tickets", json=payload, timeout=self.timeout)
+            res.raise_for_status()
+            ticket = res.json()
+            logger.info(f"🎟️ Created Zammad ticket: {ticket.get('id')}")
+            return ticket
+        except requests.exceptions.HTTPError as e:
+            # The cached id may point at a merged/deleted user; resolve it again next time
+            self.user_ids.pop(email)
+            _log_http_error(e, "create Zammad ticket")
+            raise
+
+    def update_ticket_feedback(self, ticket_id: int, feedback: str):
+        """
+        Updates the Zammad ticket with answer_feedback custom field.
+        """
+        try:
+            payload = {
+                "custom_fields": {
+                    "answer_feedback": feedback
+                }
             }
-        }
-        res = requests.put(f"{ZAMMAD_API}/tickets/{ticket_id}", json=payload, headers=HEADERS)
-        res.raise_for_status()
-        logger.info(f"✅ Ticket {ticket_id} updated with feedback: {feedback}")
-    except Exception as e:
-        logger.error(f"❌ Failed to update ticket feedback: {e}")
\ No newline at end of file
+            res = self.session.put(f"{self.api}/tickets/{ticket_id}", json=payload, timeout=self.timeout)
+            res.raise_for_status()
+            logger.info(f"✅ Ticket {ticket_id} updated with feedback: {feedback}")
+        except Exception as e:
+            logger.error(f"❌ Failed to update ticket feedback: {e}")
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncZammadClient:
+    """
+    asyncio variant of ZammadClient on a pooled httpx.AsyncClient. By default it shares the
+    user-id cache of the module-level sync client, so a user resolved by either is known to both.
+    """
+
+    def __init__(self, api: str = ZAMMAD_API, headers: dict = HEADERS, pool_size: int = POOL_SIZE,
+                 timeout: float = TIMEOUT, user_ids: TTLCache = None):
+        self.client = httpx.AsyncClient(
+            base_url=api.rstrip("/"),
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+        self.user_ids = user_ids if user_ids is not None else client.user_ids
+
+    async def find_user_by_email(self, email: str):
+        try:
+            res = await self.client.get("/users/search", params={"query": email})
+            res.raise_for_status()
+            users = res.json()
+            return users[0] if users else None
+        except Exception as e:
+            logger.error(f"❌ Failed to search user in Zammad: {e}")
+            return None
+
+    async def create_user(self, email: str, firstname: str = "", lastname: str = ""):
+        try:
+            res = await self.client.post("/users", json=_user_payload(email, firstname, lastname))
+            res.raise_for_status()
+            logger.info(f"👤 Created Zammad user: {email}")
+            return res.json()
+        except Exception as e:
+            logger.error(f"❌ Failed to create user in Zammad: {e}")
+            return None
+
+    async def ensure_user_id(self, email: str, firstname: str, lastname: str):
+        email = email.lower().strip()
+        if (user_id := self.user_ids.get(email)) is not None:
+            return user_id
+
+        user = await self.find_user_by_email(email) or await self.create_user(email, firstname, lastname)
+        if not user:
+            return None
+        self.user_ids.set(email, user["id"])
+        return user["id"]
+
+    async def create_ticket(self, subject: str, body: str, user_info: dict):
+        email = user_info["email"].lower().strip()
+        customer_id = await self.ensure_user_id(email, user_info.get("firstname", ""), user_info.get("lastname", ""))
+        if customer_id is None:
+            logger.warning("⚠️ Ticket skipped — user not found/created")
+            raise RuntimeError(f"Zammad user not found/created: {user_info['email']}")
+
+        try:
+            res = await self.client.post("/tickets", json=_ticket_payload(subject, body, customer_id))
+            res.raise_for_status()
+            ticket = res.json()
+            logger.info(f"🎟️ Created Zammad ticket: {ticket.get('id')}")
+            return ticket
+        except httpx.HTTPStatusError as e:
+            self.user_ids.pop(email)
+            _log_http_error(e, "create Zammad ticket")
+            raise
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# === MODULE-LEVEL API (process-wide pooled client) ===
+client = ZammadClient()
+
+def find_user_by_email(email: str):
+    return client.find_user_by_email(email)
+
+def create_user(email: str, firstname: str = "", lastname: str = ""):
+    return client.create_user(email, firstname, lastname)
+
+def ensure_user(email: str, firstname: str, lastname: str):
+    user_id = client.ensure_user_id(email, firstname, lastname)
+    return {"id": user_id} if user_id is not None else None
+
+def create_ticket(subject: str, body: str, user_info: dict):
+    return client.create_ticket(subject, body, user_info)
+
+def update_ticket_feedback(ticket_id: int, feedback: str):
+    client.update_ticket_feedback(ticket_id, feedback)